@@ -0,0 +1,63 @@
+"""Benchmark the startup time of the Django project and the import cost of
+the heavy modules used by datadoc.
+
+Each measure is done in a fresh Python interpreter:
+
+    python benchmarks/startup.py [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+import datadoc.urls
+startup = time.perf_counter() - start
+from datadoc.utils import HEAVY_MODULES, preload
+loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+start = time.perf_counter()
+timing = preload()
+warmup = time.perf_counter() - start
+print(json.dumps(dict(startup=startup, warmup=warmup, loaded=loaded,
+                      modules=timing)))
+"""
+
+
+def measure() -> dict:
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="core.settings")
+    out = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=BASE_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.repeat)]
+    startup = [r["startup"] * 1000 for r in results]
+    warmup = [r["warmup"] * 1000 for r in results]
+    print(f"django startup: {statistics.median(startup):8.1f} ms (median)")
+    print(f"preload:        {statistics.median(warmup):8.1f} ms (median)")
+    for name in results[0]["modules"]:
+        ms = statistics.median(r["modules"][name] * 1000 for r in results)
+        print(f"  {name:28s}{ms:8.1f} ms")
+    if results[0]["loaded"]:
+        print("imported at startup:", ", ".join(results[0]["loaded"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -56,6 +56,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "datadoc.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -100,6 +101,30 @@ DATADOCWEB = {
         "username": env.str("TRIPLESTORE_USERNAME", None),
         "password": env.str("TRIPLESTORE_PASSWORD", None)
     },
+    "cache": {
+        "maxsize": 512,
+        "max_rows": 10000,
+        "slowest": 10,
+        "ttl": env.float("TRIPLESTORE_CACHE_TTL", None)
+    },
+    "admission": {
+        "read": {"limit": 8, "queue": 32, "timeout": 10},
+        "write": {"limit": 2, "queue": 8, "timeout": 60},
+        "retry_after": 5
+    },
+    "sparql": {
+        "timeout": 30,
+        "max_rows": 10000,
+        "cache_max_rows": 1000,
+        "slow_query": 5.0,
+        "workers": 4
+    },
+    "profile": {
+        # seconds, None disables the sampling of the requests
+        "slow_threshold": env.float("DATADOC_SLOW_REQUEST", None),
+        "interval": 0.05,
+        "max_profiles": 200
+    },
     "prefix": {
         "foaf": "http://xmlns.com/foaf/0.1/",
         "prov": "http://www.w3.org/ns/prov#",
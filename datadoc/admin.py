@@ -1,3 +1,21 @@
 from django.contrib import admin
+from django.utils.html import format_html
 
-# Register your models here.
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("created", "kind", "method", "path", "duration",
+                    "status_code", "user")
+    list_filter = ("kind", "method")
+    search_fields = ("path", "user")
+    exclude = ("profile",)
+    readonly_fields = ("created", "kind", "method", "path", "duration",
+                       "status_code", "user", "report")
+
+    def report(self, obj):
+        return format_html("<pre>{}</pre>", obj.profile)
+
+    def has_add_permission(self, request):
+        return False
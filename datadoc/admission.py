@@ -0,0 +1,198 @@
+"""Admission control of the requests which use the triplestore
+
+The reads (search in the explore view) and the writes (uploads) have
+separate budgets configured in DATADOCWEB['admission']:
+
+    "admission": {
+        "read": {"limit": 8, "queue": 32, "timeout": 10},
+        "write": {"limit": 2, "queue": 8, "timeout": 60},
+        "retry_after": 5,
+    }
+
+At most `limit` requests of a budget run at once (per process), up to
+`queue` requests wait for at most `timeout` seconds and the others are
+rejected with a 503 response and a Retry-After header.
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .utils import get_setting, json_response
+
+
+class Overloaded(Exception):
+    """Server busy"""
+
+
+class AdmissionLimiter:
+    """ Limit the number of concurrent requests with a bounded queue """
+
+    def __init__(self, name: str, limit: int = None, queue: int = 0,
+                 timeout: float = 10):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def acquire(self):
+        """ Wait for a slot, raise Overloaded if the queue is full or if
+            the timeout expires.
+        """
+        with self.condition:
+            if self.limit is None or self.active < self.limit:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.queue:
+                self.rejected += 1
+                raise Overloaded(f'Too many {self.name} requests')
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            start = time.monotonic()
+            try:
+                admitted = self.condition.wait_for(
+                    lambda: self.active < self.limit, self.timeout
+                )
+            finally:
+                self.waiting -= 1
+                elapsed = time.monotonic() - start
+                self.wait_time += elapsed
+                self.max_wait_time = max(self.max_wait_time, elapsed)
+            if not admitted:
+                self.rejected += 1
+                raise Overloaded(f'Timeout of the {self.name} requests queue')
+            self.active += 1
+            self.admitted += 1
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    def stats(self) -> dict:
+        """ Return the metrics of the limiter """
+        with self.condition:
+            queued = self.admitted + self.rejected
+            return {
+                'name': self.name,
+                'limit': self.limit,
+                'queue': self.queue,
+                'active': self.active,
+                'waiting': self.waiting,
+                'max_waiting': self.max_waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'mean_wait': self.wait_time / queued if queued else 0.0,
+                'max_wait': self.max_wait_time,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(budget: str) -> AdmissionLimiter:
+    """ Return the limiter of a budget ("read" or "write") """
+    with _limiters_lock:
+        if budget not in _limiters:
+            config = (get_setting('admission', {}) or {}).get(budget, {})
+            _limiters[budget] = AdmissionLimiter(
+                budget,
+                limit=config.get('limit', None),
+                queue=config.get('queue', 0),
+                timeout=config.get('timeout', 10),
+            )
+        return _limiters[budget]
+
+
+@receiver(setting_changed)
+def reset_limiters(setting, **kwargs):
+    if setting == 'DATADOCWEB':
+        with _limiters_lock:
+            _limiters.clear()
+
+
+def admission_stats() -> list:
+    """ Return the metrics of all the limiters """
+    return [limiter.stats() for limiter in list(_limiters.values())]
+
+
+def retry_after() -> str:
+    """ Return the value of the Retry-After header """
+    return str((get_setting('admission', {}) or {}).get('retry_after', 5))
+
+
+@contextmanager
+def admission_control(budget: str):
+    """ Run a block of code within the budget (raise Overloaded) """
+    limiter = get_limiter(budget)
+    limiter.acquire()
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+class AdmittedIterator:
+    """ Iterator which holds a slot of a budget until it is exhausted or
+        closed (e.g. the content of a streaming response, which is produced
+        after the view returns)
+    """
+
+    def __init__(self, budget: str, iterable):
+        self.limiter = get_limiter(budget)
+        self.iterator = iter(iterable)
+        self.released = True
+        self.limiter.acquire()
+        self.released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.released:
+            self.released = True
+            self.limiter.release()
+            if hasattr(self.iterator, 'close'):
+                self.iterator.close()
+
+    def __del__(self):
+        self.close()
+
+
+def admit(budget: str):
+    """ Decorator of the views which returns a 503 JSON response when the
+        budget is exhausted.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                with admission_control(budget):
+                    return view(request, *args, **kwargs)
+            except Overloaded as ex:
+                response = json_response("Error", f'Server busy: {ex}', 503)
+                response['Retry-After'] = retry_after()
+                return response
+        return wrapper
+    return decorator
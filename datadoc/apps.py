@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class DataDocConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'datadoc'
+
+    def ready(self):
+        from .utils import get_setting, preload
+        if get_setting('preload', False):
+            preload()
@@ -0,0 +1,201 @@
+"""Bulk import of the files listed in a manifest
+
+A manifest is a list of file URLs: a JSON list (of URLs or of objects with a
+"url" or "downloadURL" item), a JSON object with an item "urls", or a text
+file with one URL per line. The relative URLs are resolved against the URL
+of the manifest. The files are fetched and documented in the triplestore
+concurrently (with `handle_file_url`), configured in DATADOCWEB:
+
+    "bulk_import": {
+        "workers": 8,       # number of concurrent imports
+        "per_host": 4,      # concurrent connections to the same host
+        "max_urls": 1000,   # maximum number of URLs of a manifest
+    }
+
+The files are downloaded concurrently to temporary files (limited per host
+only), then each one is written to the triplestore within a slot of the
+"write" admission budget (see datadoc.admission) like an upload, the files
+which are not admitted are reported as failed (503).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.db import connection
+
+from .admission import Overloaded, admission_control
+from .utils import (
+    get_filetype, get_setting, get_triplestore, handle_local_file
+)
+
+CHUNK_SIZE = 1 << 16
+
+
+class ManifestError(Exception):
+    """Invalid manifest"""
+
+
+def parse_manifest(text: str, base_url: str = '') -> list:
+    """ Return the URLs listed in a manifest (JSON or text) """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = [
+            line.strip() for line in text.splitlines()
+            if line.strip() and not line.strip().startswith('#')
+        ]
+    if isinstance(data, dict):
+        data = data.get('urls', None)
+    if not isinstance(data, list):
+        raise ManifestError('The manifest is not a list of URLs')
+    urls = []
+    for item in data:
+        if isinstance(item, dict):
+            item = item.get('url', None) or item.get('downloadURL', None)
+        if not isinstance(item, str) or not item.strip():
+            raise ManifestError(f'Invalid item in the manifest: {item!r}')
+        url = urljoin(base_url, item.strip()) if base_url else item.strip()
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+
+def fetch_manifest(url: str) -> list:
+    """ Download a manifest and return its URLs """
+    import requests
+    response = requests.get(url, timeout=30)
+    if response.status_code != 200:
+        raise ManifestError(
+            f'Failed to fetch the manifest. '
+            f'Status code: {response.status_code}'
+        )
+    return parse_manifest(response.text, url)
+
+
+class HostLimiter:
+    """ Limit the number of concurrent connections per host """
+
+    def __init__(self, per_host: int = 4):
+        self.per_host = per_host
+        self.lock = threading.Lock()
+        self.semaphores = {}
+
+    def __call__(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.Semaphore(self.per_host)
+            return self.semaphores[host]
+
+
+def download(url: str, timeout: float = 60) -> str:
+    """ Download a file to a temporary file and return its path, raise
+        ManifestError if the server does not return it
+    """
+    import requests
+    suffix = Path(urlparse(url).path).suffix
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise ManifestError(
+                f'Failed to fetch file. '
+                f'Status code: {response.status_code}'
+            )
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+    return path
+
+
+def import_url(url: str, ts, limiter: HostLimiter) -> dict:
+    """ Import a file from its URL and return the outcome and the timing """
+    result = {'url': url, 'status': '', 'message': '', 'status_code': None,
+              'wait': 0.0, 'download': 0.0, 'duration': 0.0}
+    if not get_filetype(url):
+        result.update(status='Error', status_code=400,
+                      message=f'Unsupported file type "{url}"')
+        return result
+    start = time.perf_counter()
+    with limiter(url):
+        started = time.perf_counter()
+        result['wait'] = started - start
+        try:
+            path = download(url)
+        except ManifestError as ex:
+            result.update(status='Error', status_code=400, message=str(ex))
+            return result
+    downloaded = time.perf_counter()
+    result['download'] = downloaded - started
+    try:
+        # the write slot is only held to write in the triplestore
+        with admission_control('write'):
+            admitted = time.perf_counter()
+            response = handle_local_file(path, url, ts)
+    except Overloaded as ex:
+        result.update(status='Error', status_code=503,
+                      message=f'Server busy: {ex}')
+        return result
+    finally:
+        os.unlink(path)
+    content = json.loads(response.content)
+    result.update(
+        status=content.get('status', ''),
+        message=content.get('message', ''),
+        status_code=response.status_code,
+        duration=time.perf_counter() - admitted,
+    )
+    result['wait'] += admitted - downloaded
+    return result
+
+
+def import_urls(urls: list, workers: int = None,
+                per_host: int = None) -> dict:
+    """ Import the files of a list of URLs concurrently and return a summary
+        with the outcome of each URL (in the order of the list).
+    """
+    config = get_setting('bulk_import', {}) or {}
+    workers = workers or config.get('workers', 8)
+    per_host = per_host or config.get('per_host', 4)
+    max_urls = config.get('max_urls', 1000)
+    if max_urls and len(urls) > max_urls:
+        raise ManifestError(f'Too many URLs ({len(urls)} > {max_urls})')
+
+    limiter = HostLimiter(per_host)
+    local = threading.local()
+
+    def run(url):
+        # one connection to the triplestore per worker
+        if not hasattr(local, 'ts'):
+            local.ts = get_triplestore()
+        try:
+            return import_url(url, local.ts, limiter)
+        except Exception as ex:
+            return {'url': url, 'status': 'Exception', 'message': str(ex),
+                    'status_code': 500, 'wait': 0.0, 'download': 0.0,
+                    'duration': 0.0}
+        finally:
+            # the statistics are saved from the worker thread
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers),
+                            thread_name_prefix='datadoc-import') as pool:
+        results = list(pool.map(run, urls))
+    succeeded = sum(1 for r in results if r['status'] == 'Success')
+    return {
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'duration': time.perf_counter() - start,
+        'results': results,
+    }
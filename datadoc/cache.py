@@ -0,0 +1,170 @@
+"""Query result cache for the triplestore"""
+
+from collections import OrderedDict
+import re
+import threading
+import time
+
+
+QUOTED_OR_SPACES = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')|\s+')
+READ_QUERY = re.compile(
+    r'^(?:(?:PREFIX\s+\S*\s*<[^>]*>|BASE\s*<[^>]*>)\s*)*(?:SELECT|ASK)\b',
+    re.IGNORECASE
+)
+
+
+def normalize_query(query: str) -> str:
+    """ Collapse the whitespaces of a SPARQL query outside of the literals """
+    def repl(match):
+        return match.group(1) or ' '
+    return QUOTED_OR_SPACES.sub(repl, query).strip()
+
+
+class QueryCache:
+    """ Size-bounded LRU cache of the read queries with statistics """
+
+    def __init__(self, maxsize: int = 256, slowest: int = 10,
+                 ttl: float = None, max_rows: int = 10000):
+        self.maxsize = maxsize
+        # larger results (lists) are not cached
+        self.max_rows = max_rows
+        self.slowest = slowest
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        # incremented on every invalidation, used to build the keys of the
+        # values derived from the query results
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """ Reset the hit/miss counters and the slowest queries """
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+            self.saved = 0.0
+            self.slowest_queries = []
+
+    def get(self, key):
+        """ Return (True, value) if the key is cached, else (False, None) """
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry and self.ttl and time.monotonic() - entry[2] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry:
+                self.entries.move_to_end(key)
+                value, elapsed, _ = entry
+                self.hits += 1
+                self.saved += elapsed
+                if isinstance(value, list):
+                    value = list(value)
+                return True, value
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, elapsed: float, text: str = '',
+            generation: int = None):
+        """ Store a query result and the time it took to compute it. The
+            result is dropped if the cache was invalidated since the given
+            generation (the query may have read the store before an update).
+        """
+        with self.lock:
+            stale = generation is not None and generation != self.generation
+            too_large = (isinstance(value, list) and self.max_rows
+                         and len(value) > self.max_rows)
+            if self.maxsize > 0 and not stale and not too_large:
+                self.entries[key] = (value, elapsed, time.monotonic())
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+            if self.slowest > 0:
+                self.slowest_queries.append(
+                    {'query': text or str(key), 'elapsed': elapsed}
+                )
+                self.slowest_queries.sort(key=lambda x: -x['elapsed'])
+                del self.slowest_queries[self.slowest:]
+
+    def invalidate(self, store: str = None):
+        """ Remove the cached entries of a store (or all the entries) """
+        with self.lock:
+            if store is None:
+                self.entries.clear()
+            else:
+                for key in [k for k in self.entries if k[0] == store]:
+                    del self.entries[key]
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self) -> dict:
+        """ Return the cache statistics """
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'invalidations': self.invalidations,
+                'saved': self.saved,
+                'slowest': list(self.slowest_queries),
+            }
+
+
+_query_cache = None
+
+
+def get_query_cache() -> QueryCache:
+    """ Return the process-wide query cache (configured from the settings) """
+    global _query_cache
+    if _query_cache is None:
+        from .utils import get_setting
+        config = get_setting('cache', {}) or {}
+        _query_cache = QueryCache(
+            maxsize=config.get('maxsize', 256),
+            slowest=config.get('slowest', 10),
+            ttl=config.get('ttl', None),
+            max_rows=config.get('max_rows', 10000)
+        )
+    return _query_cache
+
+
+STORE_VERSION_KEY = 'datadoc:store-version'
+
+
+def fragment_cache():
+    """ Return the Django cache used by the template fragments """
+    from django.conf import settings
+    from django.core.cache import caches
+    if 'template_fragments' in settings.CACHES:
+        return caches['template_fragments']
+    return caches['default']
+
+
+def get_store_version() -> int:
+    """ Return the version of the triplestore content, stored in the cache
+        of the template fragments so that it is shared by the processes when
+        the cache backend is shared (memcached, redis, database...).
+    """
+    cache = fragment_cache()
+    version = cache.get(STORE_VERSION_KEY, None)
+    if version is None:
+        cache.add(STORE_VERSION_KEY, 1, None)
+        version = cache.get(STORE_VERSION_KEY, 1)
+    return version
+
+
+def bump_store_version() -> int:
+    """ Increment the version of the triplestore content (after a write) and
+        return the new version
+    """
+    cache = fragment_cache()
+    try:
+        return cache.incr(STORE_VERSION_KEY)
+    except ValueError:
+        # missing key (evicted or first write)
+        if cache.add(STORE_VERSION_KEY, 2, None):
+            return 2
+        return cache.incr(STORE_VERSION_KEY)
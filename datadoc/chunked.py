@@ -0,0 +1,187 @@
+"""Resumable chunked uploads
+
+An upload is created with `init`, the file is sent in chunks appended at a
+given offset (the offset of an interrupted upload can be requested to resume
+it) and the assembled file is documented in the triplestore by `finalize`.
+The parts are stored on the local disk in DATADOCWEB['upload_dir'].
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+import hashlib
+import json
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover (Windows)
+    fcntl = None
+
+from .utils import get_filetype, get_setting
+
+UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+COPY_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Chunked upload error"""
+
+    def __init__(self, message: str, status_code: int = 400, **extra):
+        super().__init__(message)
+        self.status_code = status_code
+        self.extra = extra
+
+
+def get_upload_dir() -> Path:
+    """ Return the folder of the chunked uploads """
+    default = Path(tempfile.gettempdir()) / 'datadoc-uploads'
+    path = Path(get_setting('upload_dir', None) or default)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+_upload_locks = {}
+_upload_locks_lock = threading.Lock()
+
+
+@contextmanager
+def locked(f, upload_id: str):
+    """ Lock an open upload file exclusively (flock, or a lock per process
+        when flock is not available)
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:  # pragma: no cover
+        with _upload_locks_lock:
+            lock = _upload_locks.setdefault(upload_id, threading.Lock())
+        with lock:
+            yield
+
+
+def sha256_file(path: Path) -> str:
+    """ Return the SHA-256 hex digest of a file """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ChunkedUpload:
+    """ A file uploaded in chunks """
+
+    def __init__(self, upload_id: str):
+        if not UPLOAD_ID.match(upload_id):
+            raise UploadError('Invalid upload id', 404)
+        folder = get_upload_dir()
+        self.id = upload_id
+        self.meta_path = folder / f'{upload_id}.meta.json'
+        if not self.meta_path.exists():
+            raise UploadError(f'Upload "{upload_id}" not found', 404)
+        self.meta = json.loads(self.meta_path.read_text())
+        self.path = folder / f'{upload_id}.part{self.meta["ext"]}'
+
+    @staticmethod
+    def create(filename: str, size: int = None,
+               checksum: str = None) -> 'ChunkedUpload':
+        """ Create a new upload of a file """
+        if not get_filetype(filename):
+            ext = Path(filename).suffix
+            raise UploadError(f'Unsupported file type "{ext}"')
+        max_size = get_setting('upload_max_size', None)
+        if max_size and size and size > max_size:
+            raise UploadError(f'File too large ({size} > {max_size} bytes)',
+                              413)
+        remove_expired_uploads()
+        upload_id = uuid.uuid4().hex
+        folder = get_upload_dir()
+        meta = {
+            'filename': Path(filename).name,
+            'ext': Path(filename).suffix.lower(),
+            'size': size,
+            'checksum': checksum.lower() if checksum else None,
+            'created': time.time(),
+        }
+        (folder / f'{upload_id}.part{meta["ext"]}').touch()
+        (folder / f'{upload_id}.meta.json').write_text(json.dumps(meta))
+        return ChunkedUpload(upload_id)
+
+    @property
+    def offset(self) -> int:
+        """ The number of bytes received """
+        return self.path.stat().st_size
+
+    def append(self, stream, offset: int, checksum: str = None) -> int:
+        """ Append a chunk read from a stream at the given offset and
+            return the new offset.
+        """
+        digest = hashlib.sha256()
+        size = self.meta['size']
+        max_size = get_setting('upload_max_size', None)
+        written = 0
+        # the offset check, the write and the truncation are done under an
+        # exclusive lock, so that concurrent chunks cannot interleave
+        with open(self.path, 'ab') as f, locked(f, self.id):
+            current = self.offset
+            if offset != current:
+                raise UploadError(f'Offset mismatch: expected {current}',
+                                  409, offset=current)
+            try:
+                for block in iter(lambda: stream.read(COPY_SIZE), b''):
+                    written += len(block)
+                    if size is not None and current + written > size:
+                        raise UploadError('Chunk exceeds the file size')
+                    if max_size and current + written > max_size:
+                        raise UploadError('File too large', 413)
+                    digest.update(block)
+                    f.write(block)
+                f.flush()
+                if checksum and digest.hexdigest() != checksum.lower():
+                    raise UploadError('Chunk checksum mismatch', 400)
+            except Exception:
+                # discard the partial chunk so that it can be sent again
+                f.truncate(current)
+                raise
+        return current + written
+
+    def assemble(self) -> Path:
+        """ Verify the size and the checksum of the uploaded file """
+        size = self.meta['size']
+        with open(self.path, 'ab') as f, locked(f, self.id):
+            offset = self.offset
+            if size is not None and offset != size:
+                raise UploadError(
+                    f'Incomplete upload: {offset} of {size} bytes', 409,
+                    offset=offset
+                )
+            checksum = self.meta['checksum']
+            if checksum and sha256_file(self.path) != checksum:
+                raise UploadError('File checksum mismatch', 400)
+        return self.path
+
+    def delete(self):
+        """ Remove the parts of the upload """
+        self.path.unlink(missing_ok=True)
+        self.meta_path.unlink(missing_ok=True)
+
+
+def remove_expired_uploads():
+    """ Remove the uploads not modified since DATADOCWEB['upload_expire']
+        seconds.
+    """
+    expire = get_setting('upload_expire', 24 * 3600)
+    limit = time.time() - expire
+    for meta_path in get_upload_dir().glob('*.meta.json'):
+        upload_id = meta_path.name.split('.', 1)[0]
+        paths = list(meta_path.parent.glob(f'{upload_id}.*'))
+        if max(path.stat().st_mtime for path in paths) < limit:
+            for path in paths:
+                path.unlink(missing_ok=True)
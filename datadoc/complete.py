@@ -0,0 +1,189 @@
+"""In-memory index for the typeahead completion
+
+The index is a sorted list of lower-cased keys (IRIs, local names, prefixed
+names, labels, RDF types and prefixes), plus one sorted list per kind of
+item, searched with a binary search. It is built from the triplestore and
+refreshed in a background thread when it is older than
+DATADOCWEB['complete']['refresh'] seconds or when the store was updated
+through datadoc.
+"""
+
+from bisect import bisect_left
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+from .cache import get_query_cache
+from .utils import get_setting, get_triplestore
+
+logger = logging.getLogger(__name__)
+
+COMPLETION_KINDS = ("iri", "label", "type", "prefix")
+LABEL_PREDICATES = (
+    "http://www.w3.org/2000/01/rdf-schema#label",
+    "http://www.w3.org/2004/02/skos/core#prefLabel",
+    "http://purl.org/dc/terms/title",
+)
+
+
+def local_name(iri: str) -> str:
+    """ Return the fragment or the last path segment of an IRI """
+    url = urlparse(iri)
+    if url.fragment:
+        return url.fragment
+    return url.path.rstrip('/').rsplit('/', 1)[-1]
+
+
+class CompletionIndex:
+    """ Sorted index of the completion items """
+
+    def __init__(self, refresh: float = 300, max_items: int = 100000):
+        self.refresh = refresh
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        # kind (None: all the kinds) -> sorted keys and items
+        self.indexes = {}
+        self.built = None
+        self.generation = None
+        self.building = False
+
+    def add(self, entries: dict, key: str, value: str, text: str, kind: str):
+        if key:
+            entries[(key.lower(), kind, value)] = text
+
+    def build(self, ts=None):
+        """ (Re)build the index from the triplestore """
+        from tripper import RDF
+
+        generation = get_query_cache().generation
+        if ts is None:
+            ts = get_triplestore(cached=False)
+        namespaces = {f'{v}': k for k, v in ts.namespaces.items()}
+        entries = {}
+
+        def add_iri(iri, kind):
+            text = local_name(iri) or iri
+            self.add(entries, iri, iri, text, kind)
+            self.add(entries, text, iri, text, kind)
+            for ns, prefix in namespaces.items():
+                if iri.startswith(ns) and len(iri) > len(ns):
+                    name = f'{prefix}:{iri[len(ns):]}'
+                    self.add(entries, name, iri, name, kind)
+
+        limit = f'LIMIT {self.max_items}'
+        rows = ts.query(
+            f'SELECT DISTINCT ?s ?t WHERE {{ ?s <{RDF.type}> ?t . '
+            f'FILTER(isIRI(?s)) }} {limit}'
+        )
+        types = set()
+        for s, t in rows:
+            add_iri(s, 'iri')
+            types.add(t)
+        for t in types:
+            if not t.startswith('_:'):
+                add_iri(t, 'type')
+
+        predicates = ' '.join(f'<{p}>' for p in LABEL_PREDICATES)
+        rows = ts.query(
+            f'SELECT ?s ?l WHERE {{ VALUES ?p {{ {predicates} }} '
+            f'?s ?p ?l . FILTER(isIRI(?s)) }} {limit}'
+        )
+        for s, label in rows:
+            self.add(entries, f'{label}', s, f'{label}', 'label')
+
+        from tripper.datadoc.dataset import get_prefixes
+        prefixes = dict(get_prefixes())
+        prefixes.update(get_setting('prefix', {}) or {})
+        prefixes.update({k: f'{v}' for k, v in ts.namespaces.items()})
+        for prefix, iri in prefixes.items():
+            self.add(entries, prefix, prefix, f'{iri}', 'prefix')
+
+        items = sorted(
+            (key, kind, value, text)
+            for (key, kind, value), text in entries.items()
+        )
+        indexes = {None: ([item[0] for item in items], items)}
+        for kind in COMPLETION_KINDS:
+            kind_items = [item for item in items if item[1] == kind]
+            indexes[kind] = ([item[0] for item in kind_items], kind_items)
+        with self.lock:
+            self.indexes = indexes
+            self.built = time.monotonic()
+            self.generation = generation
+
+    def is_stale(self) -> bool:
+        """ Whether the index should be rebuilt """
+        if self.built is None:
+            return True
+        if self.generation != get_query_cache().generation:
+            return True
+        return time.monotonic() - self.built > self.refresh
+
+    def refresh_async(self):
+        """ Rebuild the index in a background thread """
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+
+        def run():
+            try:
+                self.build()
+            except Exception:
+                logger.exception('failed to build the completion index')
+            finally:
+                self.building = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def complete(self, text: str, kind: str = None, limit: int = 10) -> list:
+        """ Return the items which start with text """
+        text = text.lower()
+        keys, items = self.indexes.get(kind or None, ([], []))
+        results = []
+        seen = set()
+        i = bisect_left(keys, text)
+        while i < len(keys) and keys[i].startswith(text):
+            _, item_kind, value, label = items[i]
+            i += 1
+            if (item_kind, value) in seen:
+                continue
+            seen.add((item_kind, value))
+            results.append({'value': value, 'text': label, 'kind': item_kind})
+            if len(results) >= limit:
+                break
+        return results
+
+
+_completion_index = None
+_completion_index_lock = threading.Lock()
+
+
+def get_completion_index() -> CompletionIndex:
+    """ Return the process-wide completion index, built on first use (by a
+        single request) and refreshed in the background when it is stale.
+    """
+    global _completion_index
+    with _completion_index_lock:
+        if _completion_index is None:
+            config = get_setting('complete', {}) or {}
+            _completion_index = CompletionIndex(
+                refresh=config.get('refresh', 300),
+                max_items=config.get('max_items', 100000)
+            )
+    index = _completion_index
+    if index.built is None:
+        # only one request builds the index, the concurrent requests get
+        # an empty completion meanwhile
+        with index.lock:
+            if index.building:
+                return index
+            index.building = True
+        try:
+            index.build()
+        finally:
+            index.building = False
+    elif index.is_stale():
+        index.refresh_async()
+    return index
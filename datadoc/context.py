@@ -0,0 +1,104 @@
+"""Default context of the datadoc views
+
+The apps listed in DATADOCWEB['apps'] can contribute to the context of the
+datadoc templates by implementing in their AppConfig:
+
+- `static_context(ctx)`: called once per process, the values are cached
+  (and deep-copied for each request, so that they can be modified by
+  `update_context`).
+- `update_context(request, ctx)`: called for every request.
+"""
+
+import copy
+import logging
+import threading
+import time
+
+from django.apps import apps
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .utils import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class ContextProvider:
+    """ Build the default context from the settings and the app configs """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Forget the resolved apps and the cached static context """
+        self.static = None
+        self.dynamic_apps = []
+        self.timing = {}
+
+    def resolve(self):
+        """ Resolve the app list and build the static context """
+        with self.lock:
+            if self.static is not None:
+                return
+            self.warn_time = get_setting('context_warn_time', 0.1)
+            static = {
+                'datadoc_base_template': get_setting(
+                    'base_template', 'datadoc/base.html'
+                )
+            }
+            app_names = get_setting('apps', [])
+            dynamic_apps = []
+            for app in apps.get_app_configs():
+                if app.name in app_names:
+                    self.timing[app.name] = {
+                        'static': 0.0, 'calls': 0, 'total': 0.0, 'max': 0.0
+                    }
+                    if hasattr(app, 'static_context'):
+                        start = time.perf_counter()
+                        app.static_context(static)
+                        elapsed = time.perf_counter() - start
+                        self.timing[app.name]['static'] = elapsed
+                    if hasattr(app, 'update_context'):
+                        dynamic_apps.append(app)
+            self.dynamic_apps = dynamic_apps
+            self.static = static
+
+    def __call__(self, request) -> dict:
+        if self.static is None:
+            self.resolve()
+        # the mutable values must not leak from a request to another
+        ctx = copy.deepcopy(self.static)
+        for app in self.dynamic_apps:
+            start = time.perf_counter()
+            app.update_context(request, ctx)
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                timing = self.timing[app.name]
+                timing['calls'] += 1
+                timing['total'] += elapsed
+                timing['max'] = max(timing['max'], elapsed)
+            if elapsed > self.warn_time:
+                logger.warning('slow context of app "%s": %.3f s',
+                               app.name, elapsed)
+        return ctx
+
+    def stats(self) -> list:
+        """ Return the context build time of each app """
+        items = []
+        with self.lock:
+            timings = [(k, dict(v)) for k, v in self.timing.items()]
+        for name, timing in timings:
+            calls = timing['calls']
+            mean = timing['total'] / calls if calls else 0.0
+            items.append(dict(name=name, mean=mean, **timing))
+        return items
+
+
+context_provider = ContextProvider()
+
+
+@receiver(setting_changed)
+def reset_context_provider(setting, **kwargs):
+    if setting in ('DATADOCWEB', 'INSTALLED_APPS'):
+        context_provider.reset()
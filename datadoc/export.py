@@ -0,0 +1,328 @@
+"""Export of the documented resources
+
+The resources are selected with a search query (as in the explore view), a
+RDF type and/or a named graph. They are read from the triplestore by pages
+(with the descriptions of the blank nodes they refer to, e.g. the
+distributions of a dataset) and serialised on the fly, so that large exports
+are produced with a constant memory.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional, TYPE_CHECKING
+from urllib.parse import quote
+import csv
+import io
+import json
+import re
+
+from .utils import INVALID_IRI
+
+if TYPE_CHECKING:  # pragma: no cover
+    from tripper import Triplestore
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "jsonld": ("application/ld+json", ".jsonld"),
+    "turtle": ("text/turtle", ".ttl"),
+}
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+# depth of the nested blank nodes exported with a resource
+BNODE_DEPTH = 4
+# maximum length of the (URL encoded) VALUES of a query, the sparqlwrapper
+# backend sends the queries in the URL of GET requests
+MAX_VALUES_LENGTH = 4000
+IRI_SCHEME = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*:")
+
+
+def iri_n3(value: str) -> str:
+    """ Return an IRI or a blank node in N-Triples notation """
+    if value.startswith("_:") or value.startswith("<"):
+        return value
+    return f"<{value}>"
+
+
+def check_iri(ts: Triplestore, value: str) -> str:
+    """ Return the IRI of a value given by the user (prefixed name or IRI),
+        raise ValueError if it is not an absolute IRI
+    """
+    iri = ts.expand_iri(value.strip())
+    if not IRI_SCHEME.match(iri) or INVALID_IRI.search(iri):
+        raise ValueError(f"Invalid IRI: {value!r}")
+    return iri
+
+
+def batched(iterable: Iterable, size: int,
+            max_length: Optional[int] = None) -> Iterator[list]:
+    """ Split an iterable in lists of at most `size` items and of at most
+        `max_length` characters (URL encoded N-Triples terms)
+    """
+    batch = []
+    length = 0
+    for item in iterable:
+        item_length = len(quote(iri_n3(item))) + 1 if max_length else 0
+        if batch and max_length and length + item_length > max_length:
+            yield batch
+            batch = []
+            length = 0
+        batch.append(item)
+        length += item_length
+        if len(batch) >= size:
+            yield batch
+            batch = []
+            length = 0
+    if batch:
+        yield batch
+
+
+def select_subjects(
+    ts: Triplestore,
+    query: str = "",
+    type: Optional[str] = None,
+    graph: Optional[str] = None,
+    page_size: int = 500,
+) -> Iterator[str]:
+    """ Yield the IRIs of the selected resources """
+    if query:
+        from tripper.datadoc import search_iris
+        yield from search_iris(ts, query)
+        return
+
+    where = "?s ?p ?o ."
+    if type:
+        where += f" ?s <{RDF_TYPE}> {iri_n3(type)} ."
+    if graph:
+        where = f"GRAPH {iri_n3(graph)} {{ {where} }}"
+    offset = 0
+    while True:
+        rows = ts.query(
+            f"SELECT DISTINCT ?s WHERE {{ {where} FILTER(isIRI(?s)) }} "
+            f"ORDER BY ?s LIMIT {page_size} OFFSET {offset}"
+        )
+        for row in rows:
+            yield row[0]
+        if len(rows) < page_size:
+            break
+        offset += page_size
+
+
+def triples_query(values: str, graph: Optional[str] = None,
+                  depth: int = BNODE_DEPTH) -> str:
+    """ Return the query of the triples of the resources ?r (VALUES) and of
+        the blank nodes they refer to (up to `depth` levels)
+    """
+    branches = ["{ ?r ?p ?o . BIND(?r AS ?s) }"]
+    for level in range(1, depth + 1):
+        path = ["?r"] + [f"?b{i}" for i in range(1, level)] + ["?s"]
+        patterns = " ".join(
+            f"{path[i]} ?p{i} {path[i + 1]} . FILTER(isBlank({path[i + 1]}))"
+            for i in range(level)
+        )
+        branches.append(f"{{ {patterns} ?s ?p ?o . }}")
+    where = " UNION ".join(branches)
+    if graph:
+        where = f"GRAPH {iri_n3(graph)} {{ {where} }}"
+    return (f"SELECT DISTINCT ?s ?p ?o WHERE {{ VALUES ?r {{ {values} }} "
+            f"{where} }}")
+
+
+def iter_triples(
+    ts: Triplestore,
+    subjects: Iterable[str],
+    graph: Optional[str] = None,
+    page_size: int = 500,
+) -> Iterator[list]:
+    """ Yield the triples of the subjects and of their blank nodes, by batch
+        of subjects
+    """
+    for batch in batched(subjects, page_size, MAX_VALUES_LENGTH):
+        values = " ".join(iri_n3(s) for s in batch)
+        yield ts.query(triples_query(values, graph))
+
+
+def export_turtle(ts: Triplestore, subjects: Iterable[str],
+                  graph: Optional[str] = None,
+                  page_size: int = 500) -> Iterator[str]:
+    """ Serialise the resources in Turtle (one triple per line) """
+    for prefix, namespace in ts.namespaces.items():
+        yield f"@prefix {prefix}: <{namespace}> .\n"
+    yield "\n"
+    for triples in iter_triples(ts, subjects, graph, page_size):
+        lines = []
+        for s, p, o in triples:
+            obj = o.n3() if hasattr(o, "n3") else iri_n3(o)
+            lines.append(f"{iri_n3(s)} {iri_n3(p)} {obj} .\n")
+        yield "".join(lines)
+
+
+def jsonld_value(value) -> dict:
+    """ Return a JSON-LD value object for an IRI or a literal """
+    if not hasattr(value, "n3"):
+        return {"@id": value}
+    obj = {"@value": str(value)}
+    if value.lang:
+        obj["@language"] = value.lang
+    elif value.datatype:
+        obj["@type"] = str(value.datatype)
+    return obj
+
+
+def export_jsonld(ts: Triplestore, subjects: Iterable[str],
+                  graph: Optional[str] = None,
+                  page_size: int = 500) -> Iterator[str]:
+    """ Serialise the resources in JSON-LD (one node per resource) """
+    context = {k: f"{v}" for k, v in ts.namespaces.items()}
+    yield '{"@context": ' + json.dumps(context) + ', "@graph": [\n'
+    sep = ""
+    for triples in iter_triples(ts, subjects, graph, page_size):
+        nodes = {}
+        for s, p, o in triples:
+            node = nodes.setdefault(s, {"@id": s})
+            if p == RDF_TYPE:
+                node.setdefault("@type", []).append(o)
+            else:
+                node.setdefault(p, []).append(jsonld_value(o))
+        for node in nodes.values():
+            yield sep + json.dumps(node)
+            sep = ",\n"
+    yield "\n]}\n"
+
+
+def compact(iri: str, namespaces: dict) -> str:
+    """ Return the prefixed name of an IRI (if a namespace matches) """
+    for prefix, namespace in namespaces.items():
+        if prefix and iri.startswith(namespace) and len(iri) > len(namespace):
+            return f"{prefix}:{iri[len(namespace):]}"
+    return iri
+
+
+def resource_dicts(triples: list, namespaces: dict) -> list:
+    """ Return the dicts of the resources (IRI subjects) of a list of
+        triples, with the blank nodes as nested dicts
+    """
+    nodes = {}
+    for s, p, o in triples:
+        node = nodes.setdefault(s, {"@id": s})
+        key = "@type" if p == RDF_TYPE else compact(p, namespaces)
+        node.setdefault(key, []).append(o)
+
+    def resolve(node, seen):
+        dct = {}
+        for key, values in node.items():
+            if key == "@id":
+                if not values.startswith("_:"):
+                    dct[key] = values
+                continue
+            items = []
+            for value in values:
+                if (isinstance(value, str) and value.startswith("_:")
+                        and value in nodes and value not in seen):
+                    items.append(resolve(nodes[value], seen | {value}))
+                elif key == "@type":
+                    items.append(compact(value, namespaces))
+                else:
+                    items.append(f"{value}")
+            if len(items) == 1:
+                dct[key] = items[0]
+            elif all(isinstance(item, dict) for item in items):
+                # several blank nodes: one column per node
+                dct[key] = json.dumps(items)
+            else:
+                dct[key] = [
+                    json.dumps(item) if isinstance(item, dict) else item
+                    for item in items
+                ]
+        return dct
+
+    return [resolve(nodes[s], set()) for s in sorted(nodes)
+            if not s.startswith("_:")]
+
+
+def table_headers(dct: dict, headers: dict, prefix: str = ""):
+    """ Add the (dot-separated) column names of a resource dict to headers
+        with their multiplicity, as in TableDoc.fromdicts().
+    """
+    for key, value in dct.items():
+        if key == "@context":
+            continue
+        if isinstance(value, dict):
+            table_headers(value, headers, prefix + key + ".")
+        else:
+            mult = len(value) if isinstance(value, list) else 1
+            name = prefix + key
+            headers[name] = max(headers.get(name, 1), mult)
+
+
+def table_row(dct: dict, headers: dict) -> list:
+    """ Return the row of a resource dict for the given headers """
+    row = []
+    for name, mult in headers.items():
+        value = dct
+        for key in name.split("."):
+            value = value.get(key, {}) if isinstance(value, dict) else {}
+        if value == {}:
+            value = None
+        if not isinstance(value, list):
+            value = [value]
+        row.extend(value + [None] * (mult - len(value)))
+    return ["" if v is None else f"{v}" for v in row]
+
+
+def export_csv(ts: Triplestore, subjects: Iterable[str],
+               graph: Optional[str] = None,
+               page_size: int = 500) -> Iterator[str]:
+    """ Serialise the resources in CSV with the TableDoc layout (the columns
+        are the prefixed names of the predicates, the blank nodes are nested
+        with dot-separated names)
+
+        The subjects are read twice: first to collect the columns, then to
+        write the rows, so `subjects` must be re-iterable (e.g. a callable
+        returning a new iterator, see export()).
+    """
+    namespaces = {k: f"{v}" for k, v in ts.namespaces.items()}
+    headers = {"@id": 1}
+    for triples in iter_triples(ts, subjects(), graph, page_size):
+        for dct in resource_dicts(triples, namespaces):
+            table_headers(dct, headers)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    names = [name for name, mult in headers.items() for _ in range(mult)]
+    writer.writerow(names)
+    for triples in iter_triples(ts, subjects(), graph, page_size):
+        for dct in resource_dicts(triples, namespaces):
+            writer.writerow(table_row(dct, headers))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export(
+    ts: Triplestore,
+    format: str = "turtle",
+    query: str = "",
+    type: Optional[str] = None,
+    graph: Optional[str] = None,
+    page_size: int = 500,
+) -> Iterator[str]:
+    """ Return a generator of the serialised resources (text chunks), raise
+        ValueError for an invalid format, type or graph
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format "{format}"')
+    if type:
+        type = check_iri(ts, type)
+    if graph:
+        graph = check_iri(ts, graph)
+
+    def subjects():
+        return select_subjects(ts, query, type, graph, page_size)
+
+    if format == "csv":
+        return export_csv(ts, subjects, graph, page_size)
+    elif format == "jsonld":
+        return export_jsonld(ts, subjects(), graph, page_size)
+    else:
+        return export_turtle(ts, subjects(), graph, page_size)
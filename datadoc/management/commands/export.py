@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from datadoc.export import EXPORT_FORMATS, export
+from datadoc.utils import get_setting, get_triplestore
+
+
+class Command(BaseCommand):
+    help = "Export the documented resources in CSV, JSON-LD or Turtle"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", default="turtle",
+                            choices=list(EXPORT_FORMATS))
+        parser.add_argument("--query", default="",
+                            help="Search query (as in the explore page)")
+        parser.add_argument("--type", default=None,
+                            help="IRI of the RDF type of the resources")
+        parser.add_argument("--graph", default=None,
+                            help="IRI of the named graph")
+        parser.add_argument("--page-size", type=int,
+                            default=get_setting("export_page_size", 500))
+        parser.add_argument("-o", "--output", default=None,
+                            help="Output file (default: standard output)")
+
+    def handle(self, *args, **options):
+        ts = get_triplestore(cached=False)
+        try:
+            chunks = export(
+                ts, options["format"], query=options["query"],
+                type=options["type"], graph=options["graph"],
+                page_size=options["page_size"],
+            )
+        except ValueError as ex:
+            raise CommandError(str(ex))
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8",
+                      newline="") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
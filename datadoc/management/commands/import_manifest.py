@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from datadoc.bulk import ManifestError, fetch_manifest, import_urls, \
+    parse_manifest
+
+
+class Command(BaseCommand):
+    help = "Import the files listed in a manifest (URL or local file)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("manifest", help="URL or path of the manifest")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="number of concurrent imports")
+        parser.add_argument("--per-host", type=int, default=None,
+                            help="concurrent connections to the same host")
+
+    def handle(self, *args, **options):
+        manifest = options["manifest"]
+        try:
+            if "://" in manifest:
+                urls = fetch_manifest(manifest)
+            else:
+                with open(manifest, encoding="utf-8") as f:
+                    urls = parse_manifest(f.read())
+            summary = import_urls(urls, options["workers"],
+                                  options["per_host"])
+        except (ManifestError, OSError) as ex:
+            raise CommandError(str(ex))
+        for result in summary["results"]:
+            self.stdout.write(
+                f'{result["status"]:<9} {result["duration"]:7.2f} s '
+                f'{result["url"]} {result["message"]}'
+            )
+        self.stdout.write(
+            f'{summary["succeeded"]} of {summary["total"]} files imported '
+            f'in {summary["duration"]:.1f} s'
+        )
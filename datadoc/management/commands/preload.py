@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from datadoc.utils import HEAVY_MODULES, preload, get_triplestore
+
+
+class Command(BaseCommand):
+    help = "Import the heavy modules used by datadoc (warm-up)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--connect", action="store_true",
+            help="Also open a connection to the configured triplestore",
+        )
+
+    def handle(self, *args, **options):
+        timing = preload(HEAVY_MODULES)
+        for name, seconds in timing.items():
+            self.stdout.write(f"{name}: {seconds * 1000:.1f} ms")
+        self.stdout.write(f"total: {sum(timing.values()) * 1000:.1f} ms")
+        if options["connect"]:
+            get_triplestore()
+            self.stdout.write("triplestore: connected")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from datadoc.statistics import recount
+from datadoc.utils import get_triplestore
+
+
+class Command(BaseCommand):
+    help = "Recount the statistics of the triplestore (drift correction)"
+
+    def handle(self, *args, **options):
+        result = recount(get_triplestore(cached=False))
+        self.stdout.write(
+            f"{result['triples']} triples (drift: {result['drift']})"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from datadoc.replica import get_replica
+
+
+class Command(BaseCommand):
+    help = "Synchronise the local read replica from the primary triplestore"
+
+    def handle(self, *args, **options):
+        replica = get_replica()
+        if replica is None:
+            raise CommandError("DATADOCWEB['replica'] is not configured")
+        count = replica.sync()
+        self.stdout.write(f"replica synchronised: {count} triples")
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=2000)),
+                ('user', models.CharField(blank=True, max_length=150)),
+                ('duration', models.FloatField(help_text='Duration in seconds')),
+                ('status_code', models.IntegerField(blank=True, null=True)),
+                ('kind', models.CharField(choices=[('manual', 'On demand'), ('slow', 'Slow request')], max_length=10)),
+                ('profile', models.TextField()),
+            ],
+            options={
+                'ordering': ['-created', '-pk'],
+            },
+        ),
+    ]
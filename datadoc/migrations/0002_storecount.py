@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datadoc', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('triples', 'Triples'), ('type', 'Resources per RDF type'), ('prefix', 'Triples per namespace'), ('graph', 'Triples per named graph'), ('upload', 'Triples added per upload'), ('recount', 'Last recount')], max_length=10)),
+                ('key', models.CharField(blank=True, max_length=2000)),
+                ('count', models.BigIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['kind', '-count', 'key'],
+                'indexes': [models.Index(fields=['kind', '-count'], name='datadoc_sto_kind_e067c3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='unique_store_count')],
+            },
+        ),
+    ]
@@ -1,3 +1,54 @@
 from django.db import models
 
-# Create your models here.
+
+class RequestProfile(models.Model):
+    """Profile of a request (see datadoc.profiling)"""
+
+    KIND_CHOICES = [
+        ("manual", "On demand"),
+        ("slow", "Slow request"),
+    ]
+
+    created = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    user = models.CharField(max_length=150, blank=True)
+    duration = models.FloatField(help_text="Duration in seconds")
+    status_code = models.IntegerField(null=True, blank=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    profile = models.TextField()
+
+    class Meta:
+        ordering = ["-created", "-pk"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration:.3f} s)"
+
+
+class StoreCount(models.Model):
+    """Counter of the content of the triplestore (see datadoc.statistics)"""
+
+    KIND_CHOICES = [
+        ("triples", "Triples"),
+        ("type", "Resources per RDF type"),
+        ("prefix", "Triples per namespace"),
+        ("graph", "Triples per named graph"),
+        ("upload", "Triples added per upload"),
+        ("recount", "Last recount"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=2000, blank=True)
+    count = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["kind", "-count", "key"]
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "key"],
+                                    name="unique_store_count"),
+        ]
+        indexes = [models.Index(fields=["kind", "-count"])]
+
+    def __str__(self):
+        return f"{self.kind} {self.key}: {self.count}"
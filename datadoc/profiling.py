@@ -0,0 +1,186 @@
+"""Profiling of the slow requests
+
+ProfilingMiddleware provides two modes:
+
+- on demand, for the staff users: the query parameter `profile=1` runs the
+  request under cProfile and returns the report (text/plain) instead of the
+  response, the header `X-Datadoc-Profile: 1` stores the report and returns
+  the response with a header `X-Datadoc-Profile-Id`.
+- automatic (opt-in, when `slow_threshold` is set): the requests are
+  sampled (stack of the request thread every `interval` seconds) and the
+  samples of the requests which last longer than `slow_threshold` seconds
+  are stored.
+
+The profiles are stored in the model RequestProfile (see the admin site).
+Configuration: DATADOCWEB['profile'] = {"slow_threshold": 5.0,
+"interval": 0.05, "max_profiles": 200}.
+"""
+
+from collections import Counter
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+
+from django.http import HttpResponse
+
+from .utils import get_setting
+
+
+def frame_name(frame) -> str:
+    """ Return a short name (file:function) of a stack frame """
+    code = frame.f_code
+    path = code.co_filename
+    parts = path.replace(os.sep, '/').rsplit('/', 2)
+    return f'{"/".join(parts[-2:])}:{code.co_name}'
+
+
+class Sampler:
+    """ Sample the stacks of the registered threads in a daemon thread """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.thread = None
+        # set while at least one thread is registered
+        self.active = threading.Event()
+
+    def start(self, thread_id: int):
+        with self.lock:
+            self.samples[thread_id] = Counter()
+            self.active.set()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True,
+                                               name='datadoc-sampler')
+                self.thread.start()
+
+    def stop(self, thread_id: int) -> Counter:
+        with self.lock:
+            samples = self.samples.pop(thread_id, Counter())
+            if not self.samples:
+                self.active.clear()
+            return samples
+
+    def run(self):
+        while True:
+            # no wake-up while there is no request to sample
+            self.active.wait()
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.samples:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, counter in self.samples.items():
+                    frame = frames.get(thread_id, None)
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame_name(frame))
+                        frame = frame.f_back
+                    if stack:
+                        counter[';'.join(reversed(stack))] += 1
+
+
+def samples_report(samples: Counter, interval: float) -> str:
+    """ Return a report of the samples: the functions with the most samples
+        (self and total) and the collapsed stacks (flame graph format).
+    """
+    total = sum(samples.values())
+    own = Counter()
+    cumulative = Counter()
+    for stack, count in samples.items():
+        names = stack.split(';')
+        own[names[-1]] += count
+        for name in set(names):
+            cumulative[name] += count
+    lines = [f'{total} samples every {interval * 1000:g} ms', '',
+             'self      total     function']
+    for name, count in own.most_common(30):
+        lines.append(f'{count:<9} {cumulative[name]:<9} {name}')
+    lines += ['', 'collapsed stacks:']
+    for stack, count in samples.most_common():
+        lines.append(f'{stack} {count}')
+    return '\n'.join(lines)
+
+
+def cprofile_report(profiler: cProfile.Profile, limit: int = 60) -> str:
+    """ Return the cProfile statistics sorted by cumulative time """
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+class ProfilingMiddleware:
+    """ Profile the requests on demand and capture the slow requests """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sampler = None
+
+    def __call__(self, request):
+        config = get_setting('profile', {}) or {}
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            if request.GET.get('profile', '') == '1':
+                return self.profile(request, True)
+            if request.headers.get('X-Datadoc-Profile', '') == '1':
+                return self.profile(request, False)
+
+        threshold = config.get('slow_threshold', None)
+        if threshold is None:
+            return self.get_response(request)
+
+        interval = config.get('interval', 0.05)
+        if self.sampler is None:
+            self.sampler = Sampler(interval)
+        thread_id = threading.get_ident()
+        self.sampler.start(thread_id)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            samples = self.sampler.stop(thread_id)
+            duration = time.perf_counter() - start
+        if duration > threshold:
+            self.save(request, response, duration, 'slow',
+                      samples_report(samples, self.sampler.interval))
+        return response
+
+    def profile(self, request, show: bool):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        duration = time.perf_counter() - start
+        report = cprofile_report(profiler)
+        item = self.save(request, response, duration, 'manual', report)
+        if show:
+            return HttpResponse(report, content_type='text/plain')
+        response['X-Datadoc-Profile-Id'] = str(item.pk)
+        return response
+
+    def save(self, request, response, duration, kind, report):
+        from .models import RequestProfile
+
+        user = getattr(request, 'user', None)
+        item = RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:2000],
+            user=user.get_username() if user and user.is_authenticated
+            else '',
+            duration=duration,
+            status_code=getattr(response, 'status_code', None),
+            kind=kind,
+            profile=report,
+        )
+        max_profiles = (get_setting('profile', {}) or {}).get(
+            'max_profiles', 200
+        )
+        old = RequestProfile.objects.values_list('pk', flat=True)
+        old = list(old[max_profiles:])
+        if old:
+            RequestProfile.objects.filter(pk__in=old).delete()
+        return item
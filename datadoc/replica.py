@@ -0,0 +1,310 @@
+"""Local read replica of the triplestore
+
+When DATADOCWEB['replica'] is configured, the searches of the explore view
+read from an embedded rdflib graph instead of the remote triplestore:
+
+    "replica": {
+        "path": BASE_DIR / "replica.nt",  # snapshot on the local disk
+        "format": "nt",
+        "sync_interval": 3600,            # seconds
+        "page_size": 10000,
+    }
+
+Each process holds its own copy of the whole graph in memory. The writes
+still go to the primary triplestore, they increment the store version
+(datadoc.cache.get_store_version, shared by the processes) and are applied to
+the replica of the process which issued them (see
+datadoc.triplestore.VersionedTriplestore). The replica of a process is
+synchronised (in a background thread) when the store version differs from the
+version of its copy, or every `sync_interval` seconds: from the snapshot
+saved by another process if it has the current version, otherwise from the
+primary by a single process at a time (the others wait for its snapshot).
+The command `python manage.py sync_replica` synchronises it as well.
+"""
+
+from pathlib import Path
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .cache import (
+    bump_store_version, fragment_cache, get_query_cache, get_store_version
+)
+from .utils import get_setting, get_triplestore
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'datadoc:replica-snapshot'
+SYNC_LOCK_KEY = 'datadoc:replica-sync'
+# seconds, expiry of the lock if the process which synchronises dies
+SYNC_LOCK_TIMEOUT = 600
+# seconds before checking again the snapshot of a process which synchronises
+RETRY_INTERVAL = 5
+
+
+def snapshot_id(path: Path) -> str:
+    """ Return an identifier of the snapshot file (replaced on each save) """
+    stat = path.stat()
+    return f'{stat.st_ino}:{stat.st_mtime_ns}'
+
+
+class Replica:
+    """ Embedded rdflib copy of the primary triplestore """
+
+    def __init__(self, path=None, format: str = 'nt',
+                 sync_interval: float = 3600, page_size: int = 10000):
+        from rdflib import Graph
+
+        self.path = Path(path) if path else None
+        self.format = format
+        self.sync_interval = sync_interval
+        self.page_size = page_size
+        self.lock = threading.RLock()
+        self.graph = Graph()
+        self.synced = None
+        self.syncing = False
+        # store version of the copy (None: unknown, synchronised again)
+        self.version = None
+        # identifier of the snapshot of the copy
+        self.snapshot = None
+        self.retry = 0.0
+        if self.path and self.path.exists():
+            try:
+                self.graph.parse(self.path, format=self.format)
+                self.synced = self.path.stat().st_mtime
+                info = self.snapshot_info()
+                if info:
+                    self.version = info['version']
+                    self.snapshot = info['id']
+            except Exception:
+                # synchronised from the primary at the first use
+                logger.exception('invalid snapshot of the replica')
+                self.graph = Graph()
+                self.synced = None
+
+    @property
+    def ready(self) -> bool:
+        """ Whether the replica holds a copy of the primary """
+        return self.synced is not None
+
+    def triplestore(self):
+        """ Return a tripper Triplestore reading from the replica """
+        from tripper import Triplestore
+
+        ts = Triplestore(backend='rdflib')
+        ts.backend.graph = self.graph
+        prefix = get_setting('prefix', None)
+        if prefix:
+            for key, val in prefix.items():
+                ts.bind(key, val)
+        return ts
+
+    def is_due(self) -> bool:
+        """ Whether the replica should be synchronised """
+        if self.synced is None or self.version is None:
+            return True
+        if time.time() < self.retry:
+            return False
+        if self.version != get_store_version():
+            return True
+        return time.time() - self.synced > self.sync_interval
+
+    def advance(self, version: int):
+        """ Set the version of the copy after a write applied to it (the
+            copy is outdated if another write happened in between)
+        """
+        with self.lock:
+            if self.version is not None and self.version == version - 1:
+                self.version = version
+
+    def snapshot_info(self) -> dict:
+        """ Return the version and the identifier of the snapshot on the
+            disk if it was saved by a process sharing the cache
+        """
+        info = fragment_cache().get(SNAPSHOT_KEY, None)
+        if not info or not self.path or info['path'] != str(self.path):
+            return None
+        try:
+            if snapshot_id(self.path) != info['id']:
+                return None
+        except OSError:
+            return None
+        return info
+
+    def load_snapshot(self, version: int) -> bool:
+        """ Load the snapshot saved by another process if it has the given
+            store version
+        """
+        from rdflib import Graph
+
+        info = self.snapshot_info()
+        if not info or info['version'] != version \
+                or info['id'] == self.snapshot:
+            return False
+        graph = Graph()
+        graph.parse(self.path, format=self.format)
+        with self.lock:
+            self.graph = graph
+            self.synced = info['synced']
+            self.version = version
+            self.snapshot = info['id']
+        get_query_cache().invalidate()
+        return True
+
+    def refresh(self):
+        """ Synchronise the replica from the snapshot of another process, or
+            from the primary if no process is synchronising it
+        """
+        if self.load_snapshot(get_store_version()):
+            return
+        cache = fragment_cache()
+        if not cache.add(SYNC_LOCK_KEY, os.getpid(), SYNC_LOCK_TIMEOUT):
+            # another process synchronises, its snapshot is loaded later
+            self.retry = time.time() + RETRY_INTERVAL
+            return
+        try:
+            self.sync()
+        finally:
+            cache.delete(SYNC_LOCK_KEY)
+
+    def sync(self, primary=None) -> int:
+        """ Copy all the triples of the primary (by pages) and return the
+            number of triples.
+        """
+        from rdflib import Graph
+        from tripper import Triplestore
+
+        if primary is None:
+            primary = get_triplestore(cached=False)
+        started = time.time()
+        version = get_store_version()
+        with self.lock:
+            self.syncing = True
+        try:
+            ts = Triplestore(backend='rdflib')
+            ts.backend.graph = graph = Graph()
+            offset = 0
+            while True:
+                rows = primary.query(
+                    'SELECT ?s ?p ?o WHERE { ?s ?p ?o } ORDER BY ?s ?p ?o '
+                    f'LIMIT {self.page_size} OFFSET {offset}'
+                )
+                ts.add_triples(rows)
+                if len(rows) < self.page_size:
+                    break
+                offset += self.page_size
+            # the results derived from the previous copy are outdated (query
+            # cache, explore fragments, completion index), the other
+            # processes load the snapshot of the new version
+            get_query_cache().invalidate()
+            with self.lock:
+                self.graph = graph
+                self.synced = started
+                self.version = version
+                self.advance(bump_store_version())
+                self.save()
+        finally:
+            self.syncing = False
+        return len(graph)
+
+    def sync_async(self):
+        """ Synchronise the replica in a background thread """
+        with self.lock:
+            if self.syncing:
+                return
+            self.syncing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('failed to synchronise the replica')
+            finally:
+                self.syncing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def save(self):
+        """ Write the snapshot of the replica on the local disk and share its
+            version with the other processes
+        """
+        if self.path:
+            with self.lock:
+                # a unique temporary file, several processes may save the
+                # snapshot at the same time
+                fd, tmp = tempfile.mkstemp(dir=self.path.parent,
+                                           prefix=self.path.name + '.',
+                                           suffix='.tmp')
+                os.close(fd)
+                try:
+                    self.graph.serialize(tmp, format=self.format)
+                    os.replace(tmp, self.path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+                self.snapshot = snapshot_id(self.path)
+                fragment_cache().set(SNAPSHOT_KEY, {
+                    'path': str(self.path),
+                    'id': self.snapshot,
+                    'version': self.version,
+                    'synced': self.synced,
+                }, None)
+
+    def add_triples(self, triples):
+        with self.lock:
+            self.triplestore().add_triples(triples)
+
+    def remove(self, subject=None, predicate=None, object=None):
+        with self.lock:
+            self.triplestore().remove(subject, predicate, object)
+
+    def update(self, query: str):
+        with self.lock:
+            self.triplestore().update(query)
+
+
+_replica = None
+_replica_lock = threading.Lock()
+
+
+def get_replica():
+    """ Return the replica (None if it is not configured) """
+    global _replica
+    config = get_setting('replica', None)
+    if not config:
+        return None
+    with _replica_lock:
+        if _replica is None:
+            _replica = Replica(
+                path=config.get('path', None),
+                format=config.get('format', 'nt'),
+                sync_interval=config.get('sync_interval', 3600),
+                page_size=config.get('page_size', 10000),
+            )
+    return _replica
+
+
+@receiver(setting_changed)
+def reset_replica(setting, **kwargs):
+    global _replica
+    if setting == 'DATADOCWEB':
+        _replica = None
+
+
+def get_read_triplestore():
+    """ Return the triplestore used for the searches: the replica if it is
+        configured and ready, otherwise the primary triplestore.
+    """
+    replica = get_replica()
+    if replica is None:
+        return get_triplestore()
+    if replica.is_due():
+        replica.sync_async()
+    if replica.ready:
+        return replica.triplestore()
+    return get_triplestore()
@@ -0,0 +1,368 @@
+"""Read-only SPARQL endpoint
+
+The SELECT and CONSTRUCT queries sent to `/sparql/` are forwarded to the
+triplestore of datadoc (get_triplestore) with a budget configured in
+DATADOCWEB:
+
+    "sparql": {
+        "timeout": 30,           # seconds
+        "max_rows": 10000,       # rows (SELECT) or triples (CONSTRUCT)
+        "cache_max_rows": 1000,  # larger results are not cached
+        "slow_query": 5.0,       # seconds, log level WARNING above
+        "workers": 4,            # threads running the queries
+    }
+
+The queries run in a shared pool of threads, each one holds a slot of the
+"read" admission budget (see datadoc.admission) until it really ends, also
+when the request has already returned a timeout. The federated queries
+(SERVICE) are rejected for the embedded rdflib backend, which would send
+them from the server.
+
+A LIMIT is added to the queries (or lowered) so that the triplestore does
+not compute more than `max_rows` results. The results are cached in the
+query cache with the normalised query and the store version (any update
+through datadoc, in any process, invalidates them). The cost of every query
+is logged by the logger "datadoc.sparql".
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import csv
+import hashlib
+import io
+import json
+import logging
+import math
+import re
+import threading
+import time
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .admission import get_limiter
+from .cache import get_query_cache, get_store_version, normalize_query
+from .utils import get_setting
+
+logger = logging.getLogger(__name__)
+
+QUERY_FORMS = ('SELECT', 'CONSTRUCT')
+QUERY_FORM = re.compile(
+    r'^(?:(?:PREFIX\s+\S*\s*<[^>]*>|BASE\s*<[^>]*>)\s*)*'
+    r'(SELECT|CONSTRUCT|ASK|DESCRIBE)\b',
+    re.IGNORECASE
+)
+COMMENT = re.compile(
+    r'("(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|<[^<>"{}|^`\\\s]*>)'
+    r'|#[^\n]*'
+)
+SOLUTION_TAIL = re.compile(r'((?:\s*\b(?:LIMIT|OFFSET)\s+\d+)*)\s*$',
+                           re.IGNORECASE)
+TAIL_CLAUSE = re.compile(r'(LIMIT|OFFSET)\s+(\d+)', re.IGNORECASE)
+LITERAL_OR_IRI = re.compile(
+    r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|<[^<>"{}|^`\\\s]*>'
+)
+BRACE_OR_VALUES = re.compile(r'[{}]|(?<![\w:?$.-])VALUES(?![\w:-])',
+                             re.IGNORECASE)
+SERVICE = re.compile(r'(?<![\w:?$.-])SERVICE(?![\w:-])', re.IGNORECASE)
+CONSTRUCT_VARS = ['subject', 'predicate', 'object']
+RESULT_FORMATS = {
+    'json': 'application/sparql-results+json',
+    'csv': 'text/csv; charset=utf-8',
+    'nt': 'application/n-triples',
+}
+CHUNK_SIZE = 500
+SYNTAX_ERRORS = ('ParseException', 'QueryBadFormed')
+
+
+class SparqlError(Exception):
+    """Invalid SPARQL query"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def strip_comments(query: str) -> str:
+    """ Remove the comments of a SPARQL query (outside of the literals and
+        of the IRIs)
+    """
+    def repl(match):
+        return match.group(1) or ''
+    return COMMENT.sub(repl, query)
+
+
+def split_values_clause(text: str) -> tuple:
+    """ Split a query before its trailing VALUES clause (the only VALUES
+        outside of the braces), which follows the solution modifiers
+    """
+    masked = LITERAL_OR_IRI.sub(lambda m: '"' * len(m.group()), text)
+    depth = 0
+    for match in BRACE_OR_VALUES.finditer(masked):
+        token = match.group()
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+        elif depth == 0:
+            start = match.start()
+            return text[:start].rstrip(), text[start:]
+    return text, ''
+
+
+def prepare_query(query: str, max_rows: int) -> tuple:
+    """ Return the query form and the normalised query with a LIMIT of at
+        most max_rows + 1 solutions (to detect the truncated results).
+    """
+    text = normalize_query(strip_comments(query))
+    match = QUERY_FORM.match(text)
+    if not match or match.group(1).upper() not in QUERY_FORMS:
+        raise SparqlError('Only SELECT and CONSTRUCT queries are allowed')
+    form = match.group(1).upper()
+    text, values = split_values_clause(text)
+    tail = SOLUTION_TAIL.search(text)
+    clauses = {k.upper(): int(v) for k, v in TAIL_CLAUSE.findall(tail[1])}
+    limit = min(clauses.get('LIMIT', max_rows + 1), max_rows + 1)
+    text = f'{text[:tail.start()]} LIMIT {limit}'
+    if 'OFFSET' in clauses:
+        text += f' OFFSET {clauses["OFFSET"]}'
+    if values:
+        text += f' {values}'
+    return form, text
+
+
+def has_service(text: str) -> bool:
+    """ Return True if the query has a SERVICE clause (outside of the
+        literals and of the IRIs)
+    """
+    return bool(SERVICE.search(LITERAL_OR_IRI.sub('""', text)))
+
+
+def rdflib_term(term) -> dict:
+    """ Return the SPARQL JSON binding of a rdflib term """
+    from rdflib import BNode, Literal
+
+    if term is None:
+        return None
+    if isinstance(term, Literal):
+        value = {'type': 'literal', 'value': f'{term}'}
+        if term.language:
+            value['xml:lang'] = term.language
+        elif term.datatype:
+            value['datatype'] = f'{term.datatype}'
+        return value
+    if isinstance(term, BNode):
+        return {'type': 'bnode', 'value': f'{term}'}
+    return {'type': 'uri', 'value': f'{term}'}
+
+
+def graph_result(graph) -> dict:
+    """ Return the result of a CONSTRUCT query (rdflib graph) """
+    return {
+        'vars': CONSTRUCT_VARS,
+        'rows': [[rdflib_term(t) for t in triple] for triple in graph],
+    }
+
+
+def sparqlwrapper_query(sparql, text: str, form: str,
+                        timeout: float) -> dict:
+    """ Run a query with SPARQLWrapper (backend "sparqlwrapper") """
+    from SPARQLWrapper import JSON, POST, TURTLE
+    from rdflib import Graph
+
+    sparql.setTimeout(max(1, math.ceil(timeout)))
+    sparql.setMethod(POST)
+    sparql.setQuery(text)
+    if form == 'CONSTRUCT':
+        sparql.setReturnFormat(TURTLE)
+        data = sparql.queryAndConvert()
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return graph_result(Graph().parse(data=data, format='turtle'))
+    sparql.setReturnFormat(JSON)
+    data = sparql.queryAndConvert()
+    names = data['head']['vars']
+    rows = []
+    for binding in data['results']['bindings']:
+        row = [binding.get(name, None) for name in names]
+        for value in row:
+            if value and value['type'] == 'typed-literal':
+                value['type'] = 'literal'
+        rows.append(row)
+    return {'vars': names, 'rows': rows}
+
+
+def rdflib_query(graph, text: str, form: str) -> dict:
+    """ Run a query on a rdflib graph (backend "rdflib") """
+    result = graph.query(text)
+    if form == 'CONSTRUCT':
+        return graph_result(result)
+    return {
+        'vars': [f'{v}' for v in result.vars],
+        'rows': [[rdflib_term(t) for t in row] for row in result],
+    }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """ Return the pool of threads which run the queries """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            config = get_setting('sparql', {}) or {}
+            _executor = ThreadPoolExecutor(
+                max_workers=config.get('workers', 4),
+                thread_name_prefix='datadoc-sparql'
+            )
+        return _executor
+
+
+@receiver(setting_changed)
+def reset_executor(setting, **kwargs):
+    global _executor
+    if setting == 'DATADOCWEB':
+        with _executor_lock:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = None
+
+
+def run_query(ts, text: str, form: str, timeout: float) -> dict:
+    """ Run a query on the backend of the triplestore within the timeout and
+        return its result ({"vars": [...], "rows": [[binding, ...], ...]}).
+        Raise Overloaded if no read slot is available.
+    """
+    backend = ts.backend
+    if hasattr(backend, 'sparql'):
+        def run():
+            return sparqlwrapper_query(backend.sparql, text, form, timeout)
+    elif hasattr(backend, 'graph'):
+        if has_service(text):
+            raise SparqlError('SERVICE is not allowed')
+
+        def run():
+            return rdflib_query(backend.graph, text, form)
+    else:
+        raise SparqlError(
+            f'Backend "{ts.backend_name}" is not supported', 501
+        )
+    limiter = get_limiter('read')
+    limiter.acquire()
+    try:
+        future = get_executor().submit(run)
+    except BaseException:
+        limiter.release()
+        raise
+    # the slot is released when the query ends (or is cancelled)
+    future.add_done_callback(lambda f: limiter.release())
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise SparqlError(f'Query timeout ({timeout} s)', 504)
+    except Exception as ex:
+        # syntax errors of rdflib and SPARQLWrapper
+        if type(ex).__name__ in SYNTAX_ERRORS:
+            raise SparqlError(f'Invalid query: {ex}')
+        raise
+
+
+def sparql_query(ts, query: str, user: str = '') -> dict:
+    """ Run a read-only query (cached) and return its result with the keys
+        form, vars, rows, truncated and cached.
+    """
+    config = get_setting('sparql', {}) or {}
+    timeout = config.get('timeout', 30)
+    max_rows = config.get('max_rows', 10000)
+    form, text = prepare_query(query, max_rows)
+
+    cache = get_query_cache()
+    store = getattr(ts, 'cache_store', None) or f'{ts.base_iri}'
+    key = (store, 'sparql', get_store_version(), text)
+    start = time.perf_counter()
+    cached, result = cache.get(key)
+    if not cached:
+        result = run_query(ts, text, form, timeout)
+        rows = result['rows']
+        result['truncated'] = len(rows) > max_rows
+        del rows[max_rows:]
+        if len(rows) <= config.get('cache_max_rows', 1000):
+            cache.put(key, result, time.perf_counter() - start, text)
+    elapsed = time.perf_counter() - start
+
+    slow = config.get('slow_query', 5.0)
+    level = logging.WARNING if slow and elapsed > slow else logging.INFO
+    logger.log(
+        level, 'sparql %s %s rows=%d truncated=%s cached=%s time=%.3fs '
+        'user=%s query=%s', hashlib.sha1(text.encode()).hexdigest()[:12],
+        form, len(result['rows']), result['truncated'], cached, elapsed,
+        user, text[:1000]
+    )
+    return dict(result, form=form, cached=cached)
+
+
+def stream_json(result: dict):
+    """ Yield the result in the SPARQL 1.1 Query Results JSON Format """
+    names = result['vars']
+    yield '{"head": {"vars": %s}, "results": {"bindings": [' % (
+        json.dumps(names)
+    )
+    rows = result['rows']
+    for i in range(0, len(rows), CHUNK_SIZE):
+        bindings = (
+            json.dumps({n: v for n, v in zip(names, row) if v is not None})
+            for row in rows[i:i + CHUNK_SIZE]
+        )
+        yield (',\n' if i else '\n') + ',\n'.join(bindings)
+    yield '\n]}}\n'
+
+
+def csv_value(value: dict) -> str:
+    if value is None:
+        return ''
+    if value['type'] == 'bnode':
+        return f'_:{value["value"]}'
+    return value['value']
+
+
+def stream_csv(result: dict):
+    """ Yield the result in the SPARQL 1.1 Query Results CSV Format """
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\r\n')
+    writer.writerow(result['vars'])
+    rows = result['rows']
+    for i in range(0, len(rows), CHUNK_SIZE):
+        for row in rows[i:i + CHUNK_SIZE]:
+            writer.writerow([csv_value(value) for value in row])
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    yield out.getvalue()
+
+
+def nt_term(value: dict) -> str:
+    if value['type'] == 'uri':
+        return f'<{value["value"]}>'
+    if value['type'] == 'bnode':
+        return f'_:{value["value"]}'
+    text = json.dumps(value['value'], ensure_ascii=False)
+    if 'xml:lang' in value:
+        return f'{text}@{value["xml:lang"]}'
+    if 'datatype' in value:
+        return f'{text}^^<{value["datatype"]}>'
+    return text
+
+
+def stream_nt(result: dict):
+    """ Yield the triples of a CONSTRUCT result in N-Triples """
+    rows = result['rows']
+    for i in range(0, len(rows), CHUNK_SIZE):
+        yield ''.join(
+            ' '.join(nt_term(value) for value in row) + ' .\n'
+            for row in rows[i:i + CHUNK_SIZE]
+        )
+
+
+RESULT_WRITERS = {'json': stream_json, 'csv': stream_csv, 'nt': stream_nt}
@@ -0,0 +1,211 @@
+"""Statistics of the content of the triplestore
+
+The counters (number of triples, resources per RDF type, triples per prefix
+namespace, per named graph and per upload) are stored in the model
+StoreCount. They are updated incrementally with the triples added by each
+successful ingestion (see datadoc.utils.record_ingestion), so that the
+dashboard does not query the triplestore. The ingestions write to the default
+graph of the triplestore, counted with the graph key "". The incremental
+counters ignore the triples which were already in the store and the removals,
+the command `python manage.py recount_statistics` recounts them from the
+triplestore (e.g. periodically with cron) to correct the drift.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+import logging
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+STATISTICS_KINDS = ("type", "prefix", "graph", "upload")
+DEFAULT_GRAPH = ""
+LOCAL_NAME = re.compile(r'[^#/]*$')
+
+
+def namespace_key(iri: str, namespaces: dict) -> str:
+    """ Return the prefix of the longest namespace of an IRI, or the
+        namespace itself (up to the last "#" or "/") if it is not bound.
+    """
+    best = None
+    for prefix, ns in namespaces.items():
+        if ns and iri.startswith(ns) and (best is None or len(ns) > best[1]):
+            best = (prefix, len(ns))
+    if best:
+        return best[0]
+    return LOCAL_NAME.sub('', iri) or iri
+
+
+def get_namespaces(ts) -> dict:
+    return {k: f'{v}' for k, v in ts.namespaces.items() if k}
+
+
+@contextmanager
+def track_triples(ts):
+    """ Collect the triples added with ts.add_triples() and ts.parse() in
+        the block
+    """
+    added = []
+    add_triples = getattr(ts, 'add_triples', None)
+    parse = getattr(ts, 'parse', None)
+    if add_triples is None:
+        yield added
+        return
+
+    def tracked(triples):
+        triples = list(triples)
+        result = add_triples(triples)
+        added.extend(triples)
+        return result
+
+    def tracked_parse(source=None, format=None, **kwargs):
+        if not hasattr(ts.backend, 'parse'):
+            # tripper parses with a fallback backend and calls add_triples
+            return parse(source, format=format, **kwargs)
+        from tripper import Triplestore
+        if hasattr(source, 'read'):
+            kwargs['data'], source = source.read(), None
+        parsed = Triplestore(backend='rdflib')
+        parsed.parse(source, format=format, **{
+            k: v for k, v in kwargs.items()
+            if not k.startswith('fallback_backend')
+        })
+        result = parse(source, format=format, **kwargs)
+        added.extend(parsed.triples())
+        return result
+
+    try:
+        ts.add_triples = tracked
+        if parse is not None:
+            ts.parse = tracked_parse
+    except AttributeError:
+        yield added
+        return
+    try:
+        yield added
+    finally:
+        del ts.add_triples
+        if 'parse' in vars(ts):
+            del ts.parse
+
+
+def count_triples(triples: list, namespaces: dict, source: str = None,
+                  graph: str = DEFAULT_GRAPH) -> Counter:
+    """ Return the counters of a list of triples (added to the graph) """
+    triples = set((f'{s}', f'{p}', f'{o}') for s, p, o in triples)
+    counts = Counter()
+    counts[('triples', '')] = len(triples)
+    counts[('graph', graph)] = len(triples)
+    if source:
+        counts[('upload', source)] = len(triples)
+    for s, p, o in triples:
+        if p == RDF_TYPE:
+            counts[('type', o)] += 1
+        if not s.startswith('_:'):
+            counts[('prefix', namespace_key(s, namespaces))] += 1
+    return counts
+
+
+def add_counts(counts: Counter):
+    """ Add counts to the counters """
+    now = timezone.now()
+    from .models import StoreCount
+
+    with transaction.atomic():
+        for (kind, key), count in counts.items():
+            key = key[:2000]
+            items = StoreCount.objects.filter(kind=kind, key=key)
+            if items.update(count=F('count') + count, updated=now):
+                continue
+            try:
+                with transaction.atomic():
+                    StoreCount.objects.create(kind=kind, key=key,
+                                              count=count)
+            except IntegrityError:
+                # created by a concurrent ingestion
+                items.update(count=F('count') + count, updated=now)
+
+
+def update_statistics(ts, triples: list, source: str = None):
+    """ Update the counters with the triples added by an ingestion """
+    if triples:
+        add_counts(count_triples(triples, get_namespaces(ts), source))
+
+
+def query_counts(ts, query: str) -> list:
+    return [(f'{key}', int(f'{count}')) for key, count in ts.query(query)]
+
+
+def recount(ts) -> dict:
+    """ Recount the counters from the triplestore (the counters per upload
+        are kept) and return the drift of the number of triples.
+    """
+    from .models import StoreCount
+
+    namespaces = get_namespaces(ts)
+    counts = Counter()
+    rows = ts.query('SELECT (COUNT(*) AS ?n) WHERE { ?s ?p ?o }')
+    counts[('triples', '')] = int(f'{rows[0][0]}') if rows else 0
+    for key, count in query_counts(
+        ts,
+        f'SELECT ?t (COUNT(DISTINCT ?s) AS ?n) '
+        f'WHERE {{ ?s <{RDF_TYPE}> ?t }} GROUP BY ?t'
+    ):
+        counts[('type', key)] = count
+    for key, count in query_counts(
+        ts,
+        'SELECT ?ns (COUNT(*) AS ?n) WHERE { ?s ?p ?o . FILTER(isIRI(?s)) '
+        'BIND(REPLACE(STR(?s), "[^#/]*$", "") AS ?ns) } GROUP BY ?ns'
+    ):
+        counts[('prefix', namespace_key(key, namespaces))] += count
+    try:
+        for key, count in query_counts(
+            ts,
+            'SELECT ?g (COUNT(*) AS ?n) WHERE { GRAPH ?g { ?s ?p ?o } } '
+            'GROUP BY ?g'
+        ):
+            counts[('graph', key)] = count
+    except Exception:
+        logger.warning('the triplestore does not count the named graphs')
+    # the default graph may be the union of the graphs (e.g. GraphDB)
+    named = sum(c for (kind, _), c in counts.items() if kind == 'graph')
+    counts[('graph', DEFAULT_GRAPH)] = max(
+        counts[('triples', '')] - named, 0
+    )
+
+    previous = StoreCount.objects.filter(kind='triples').first()
+    drift = counts[('triples', '')] - (previous.count if previous else 0)
+    counts[('recount', '')] = drift
+    with transaction.atomic():
+        StoreCount.objects.exclude(kind='upload').delete()
+        StoreCount.objects.bulk_create([
+            StoreCount(kind=kind, key=key[:2000], count=count)
+            for (kind, key), count in counts.items()
+        ])
+    return {'triples': counts[('triples', '')], 'drift': drift}
+
+
+def get_statistics(limit: int = 50) -> dict:
+    """ Return the counters (the largest ones of each kind) """
+    from .models import StoreCount
+
+    items = {
+        item.kind: item for item in
+        StoreCount.objects.filter(kind__in=('triples', 'recount'))
+    }
+    stats = {
+        'triples': items['triples'].count if 'triples' in items else 0,
+        'updated': items['triples'].updated if 'triples' in items else None,
+        'recount': items.get('recount', None),
+    }
+    for kind in STATISTICS_KINDS:
+        stats[kind] = list(
+            StoreCount.objects.filter(kind=kind).order_by('-count', 'key')
+            .values('key', 'count')[:limit]
+        )
+    return stats
@@ -0,0 +1,90 @@
+from unittest.mock import ANY, patch
+
+from django.test import TestCase
+from django.urls import reverse
+
+from datadoc.cache import bump_store_version, fragment_cache
+from datadoc.templatetags.datadoc_tags import result_rows
+from datadoc.utils import value_to_cell
+
+
+TABLE = {
+    "key": "0123456789",
+    "cols": ["@id", "@type", "title"],
+    "rows": [[
+        value_to_cell("http://example.com/data#image1"),
+        value_to_cell("http://example.com/files/image1.png"),
+        value_to_cell("<b>SEM image</b>"),
+    ]],
+    "facets": [
+        {"value": "http://example.com/data#SEMImage", "text": "SEMImage",
+         "count": 3, "selected": True},
+    ],
+    "prefix": {},
+}
+
+
+class ResultRowsTagTests(TestCase):
+    def test_result_rows(self):
+        html = result_rows(TABLE["rows"])
+        self.assertEqual(
+            html,
+            '<tr><td title="http://example.com/data#image1">image1</td>'
+            '<td><a href="http://example.com/files/image1.png">image1.png</a>'
+            '</td><td>&lt;b&gt;SEM image&lt;/b&gt;</td></tr>\n'
+        )
+
+
+class ExploreViewTests(TestCase):
+    def setUp(self):
+        fragment_cache().clear()
+    @patch("datadoc.views.triplestore_search", return_value=TABLE)
+    def test_explore_renders_the_results(self, mock_search):
+        response = self.client.get(
+            reverse("datadoc:explore"), {"query": "image"},
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        mock_search.assert_called_once_with("image", (), ANY)
+
+    @patch("datadoc.views.triplestore_search", return_value=TABLE)
+    def test_explore_table(self, mock_search):
+        response = self.client.get(reverse("datadoc:explore"),
+                                   {"query": "image"})
+        self.assertContains(response, 'id="result"')
+        self.assertContains(
+            response, '<a href="http://example.com/files/image1.png">'
+        )
+
+    @patch("datadoc.views.triplestore_search", return_value=TABLE)
+    def test_explore_type_facets(self, mock_search):
+        response = self.client.get(reverse("datadoc:explore"), {
+            "type": ["http://example.com/data#SEMImage",
+                     "http://example.com/data#Sample"]
+        })
+        mock_search.assert_called_once_with(
+            "", ("http://example.com/data#SEMImage",
+                 "http://example.com/data#Sample"), ANY
+        )
+        self.assertContains(response, 'id="search-facets"')
+        self.assertContains(
+            response, 'value="http://example.com/data#SEMImage"'
+        )
+        self.assertContains(response, '<span class="badge text-bg-light">3')
+
+    @patch("datadoc.views.triplestore_search", return_value=TABLE)
+    def test_explore_fragment_cache(self, mock_search):
+        url = reverse("datadoc:explore")
+        self.client.get(url, {"query": "image"})
+        # the cached table is rendered without searching
+        response = self.client.get(url, {"query": "image"})
+        self.assertEqual(mock_search.call_count, 1)
+        self.assertContains(
+            response, '<a href="http://example.com/files/image1.png">'
+        )
+        self.assertContains(response, 'id="search-facets"')
+        # an upload (new store version) searches again
+        bump_store_version()
+        self.client.get(url, {"query": "image"})
+        self.assertEqual(mock_search.call_count, 2)
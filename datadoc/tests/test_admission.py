@@ -0,0 +1,70 @@
+import threading
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from datadoc.admission import AdmissionLimiter, Overloaded
+
+
+BUSY = dict(
+    settings.DATADOCWEB,
+    admission={
+        "read": {"limit": 0, "queue": 0},
+        "write": {"limit": 0, "queue": 0},
+        "retry_after": 7,
+    },
+)
+
+
+class AdmissionLimiterTests(SimpleTestCase):
+    def test_reject_when_the_queue_is_full(self):
+        limiter = AdmissionLimiter("read", limit=1, queue=0)
+        limiter.acquire()
+        with self.assertRaises(Overloaded):
+            limiter.acquire()
+        limiter.release()
+        limiter.acquire()
+        stats = limiter.stats()
+        self.assertEqual(stats["admitted"], 2)
+        self.assertEqual(stats["rejected"], 1)
+
+    def test_queue_timeout(self):
+        limiter = AdmissionLimiter("write", limit=1, queue=1, timeout=0.01)
+        limiter.acquire()
+        with self.assertRaises(Overloaded):
+            limiter.acquire()
+        self.assertEqual(limiter.stats()["max_waiting"], 1)
+
+    def test_queued_request_is_admitted_on_release(self):
+        limiter = AdmissionLimiter("write", limit=1, queue=1, timeout=5)
+        limiter.acquire()
+        admitted = threading.Event()
+
+        def waiter():
+            limiter.acquire()
+            admitted.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        limiter.release()
+        thread.join(5)
+        self.assertTrue(admitted.is_set())
+        self.assertEqual(limiter.stats()["active"], 1)
+
+
+@override_settings(DATADOCWEB=BUSY)
+class AdmissionViewTests(SimpleTestCase):
+    def test_explore_busy(self):
+        response = self.client.get(reverse("datadoc:explore"),
+                                   {"query": "image"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertContains(response, "Server busy", status_code=503)
+
+    def test_upload_busy(self):
+        response = self.client.post(reverse("datadoc:process_csv"),
+                                    {"csv_data": "@id,@type"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(response.json()["status"], "Error")
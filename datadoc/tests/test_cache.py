@@ -0,0 +1,121 @@
+from django.test import SimpleTestCase
+
+from tripper import RDF
+
+from datadoc.cache import (
+    STORE_VERSION_KEY, QueryCache, fragment_cache, normalize_query
+)
+from datadoc.triplestore import CachedTriplestore
+from datadoc.utils import result_key
+
+
+EX = "http://example.com/"
+
+
+class NormalizeQueryTests(SimpleTestCase):
+    def test_whitespaces_are_collapsed_outside_literals(self):
+        query = 'SELECT ?s\n  WHERE {\t?s ?p "a  b" }  '
+        self.assertEqual(
+            normalize_query(query), 'SELECT ?s WHERE { ?s ?p "a  b" }'
+        )
+
+
+class QueryCacheTests(SimpleTestCase):
+    def test_lru_eviction(self):
+        cache = QueryCache(maxsize=2)
+        cache.put("a", 1, 0.1)
+        cache.put("b", 2, 0.2)
+        cache.get("a")
+        cache.put("c", 3, 0.3)
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("c"), (True, 3))
+
+    def test_stats(self):
+        cache = QueryCache(maxsize=4, slowest=2)
+        cache.put("a", 1, 0.5, "query a")
+        cache.put("b", 2, 0.1, "query b")
+        cache.put("c", 3, 0.9, "query c")
+        cache.get("a")
+        cache.get("x")
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertAlmostEqual(stats["saved"], 0.5)
+        self.assertEqual(
+            [x["query"] for x in stats["slowest"]], ["query c", "query a"]
+        )
+
+    def test_stale_and_large_results_are_not_cached(self):
+        cache = QueryCache(max_rows=2)
+        generation = cache.generation
+        cache.invalidate()
+        cache.put("a", [1], 0.1, generation=generation)
+        cache.put("b", [1, 2, 3], 0.1, generation=cache.generation)
+        cache.put("c", [1, 2], 0.1, generation=cache.generation)
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("c"), (True, [1, 2]))
+
+
+class CachedTriplestoreTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = QueryCache()
+        self.ts = CachedTriplestore(backend="rdflib", cache=self.cache)
+        self.ts.add_triples([(f"{EX}a", RDF.type, f"{EX}Dataset")])
+
+    def test_read_queries_are_cached(self):
+        query = "SELECT ?s WHERE { ?s ?p ?o }"
+        self.assertEqual(self.ts.query(query), [(f"{EX}a",)])
+        self.assertEqual(self.ts.query(f"  {query}\n"), [(f"{EX}a",)])
+        self.assertEqual(list(self.ts.objects(predicate=RDF.type)),
+                         [f"{EX}Dataset"])
+        list(self.ts.objects(predicate=RDF.type))
+        stats = self.cache.stats()
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["hits"], 2)
+
+    def test_updates_invalidate_the_cache(self):
+        list(self.ts.objects(predicate=RDF.type))
+        self.ts.add_triples([(f"{EX}b", RDF.type, f"{EX}Sample")])
+        types = set(self.ts.objects(predicate=RDF.type))
+        self.assertEqual(types, {f"{EX}Dataset", f"{EX}Sample"})
+        self.ts.remove(subject=f"{EX}a")
+        types = set(self.ts.objects(predicate=RDF.type))
+        self.assertEqual(types, {f"{EX}Sample"})
+
+    def test_updates_of_other_processes_invalidate_the_cache(self):
+        query = "SELECT ?s WHERE { ?s ?p ?o }"
+        self.assertEqual(self.ts.query(query), [(f"{EX}a",)])
+        # another process (with its own query cache) writes to the store
+        other = CachedTriplestore(backend="rdflib", cache=QueryCache())
+        other.backend.graph = self.ts.backend.graph
+        other.add_triples([(f"{EX}b", RDF.type, f"{EX}Sample")])
+        self.assertEqual(sorted(self.ts.query(query)),
+                         [(f"{EX}a",), (f"{EX}b",)])
+
+    def test_read_concurrent_with_update_is_not_cached(self):
+        query = "SELECT ?s WHERE { ?s ?p ?o }"
+        backend_query = self.ts.backend.query
+
+        def query_then_update(*args, **kwargs):
+            # an update issued while the read is in progress
+            result = backend_query(*args, **kwargs)
+            self.cache.invalidate()
+            return result
+
+        self.ts.backend.query = query_then_update
+        self.ts.query(query)
+        del self.ts.backend.query
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_writes_change_the_result_key(self):
+        key = result_key(self.ts, "Dataset")
+        self.assertEqual(result_key(self.ts, "Dataset"), key)
+        self.ts.add_triples([(f"{EX}b", RDF.type, f"{EX}Sample")])
+        new_key = result_key(self.ts, "Dataset")
+        self.assertNotEqual(new_key, key)
+        # a write in another process sharing the cache backend
+        fragment_cache().incr(STORE_VERSION_KEY)
+        self.assertNotEqual(result_key(self.ts, "Dataset"), new_key)
@@ -0,0 +1,122 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from tripper import DCTERMS, RDF, Literal, Triplestore
+
+from datadoc import complete
+from datadoc.complete import CompletionIndex, get_completion_index
+
+
+EX = "http://example.com/data#"
+
+
+def make_index():
+    ts = Triplestore(backend="rdflib")
+    ts.bind("ex", EX)
+    ts.add_triples([
+        (f"{EX}image1", RDF.type, f"{EX}SEMImage"),
+        (f"{EX}image1", DCTERMS.title, Literal("Cement sample")),
+        (f"{EX}image2", RDF.type, f"{EX}SEMImage"),
+    ])
+    index = CompletionIndex()
+    index.build(ts)
+    return index
+
+
+class CompletionIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = make_index()
+
+    def test_complete_local_and_prefixed_names(self):
+        values = [x["value"] for x in self.index.complete("image", "iri")]
+        self.assertEqual(values, [f"{EX}image1", f"{EX}image2"])
+        values = [x["value"] for x in self.index.complete("ex:IMAGE2")]
+        self.assertEqual(values, [f"{EX}image2"])
+
+    def test_complete_types_labels_and_prefixes(self):
+        self.assertEqual(
+            self.index.complete("sem", "type"),
+            [{"value": f"{EX}SEMImage", "text": "SEMImage", "kind": "type"}],
+        )
+        self.assertEqual(
+            self.index.complete("cement")[0]["value"], f"{EX}image1"
+        )
+        prefixes = self.index.complete("ex", "prefix")
+        self.assertIn({"value": "ex", "text": EX, "kind": "prefix"},
+                      prefixes)
+
+    def test_complete_limit(self):
+        self.assertEqual(len(self.index.complete("", limit=3)), 3)
+
+    def test_complete_kind_in_its_own_index(self):
+        ts = Triplestore(backend="rdflib")
+        ts.bind("hx", "http://h.org/")
+        ts.add_triples([
+            (f"http://h.org/{i}", RDF.type, f"{EX}Item") for i in range(2000)
+        ])
+        index = CompletionIndex()
+        index.build(ts)
+        keys, items = index.indexes["prefix"]
+        self.assertEqual({item[1] for item in items}, {"prefix"})
+        self.assertLess(len(keys), 1000)
+        # the prefixes starting with "h" are found without scanning the
+        # keys of the IRIs "http://h.org/..."
+        results = index.complete("h", "prefix")
+        self.assertIn({"value": "hx", "text": "http://h.org/",
+                       "kind": "prefix"}, results)
+        self.assertEqual({x["kind"] for x in results}, {"prefix"})
+        self.assertEqual(index.complete("h", "other"), [])
+
+
+class FirstBuildTests(SimpleTestCase):
+    def setUp(self):
+        complete._completion_index = None
+        self.addCleanup(setattr, complete, "_completion_index", None)
+
+    def test_first_build_is_done_once(self):
+        calls = []
+
+        def slow_build(index, ts=None):
+            calls.append(1)
+            time.sleep(0.1)
+            index.built = time.monotonic()
+
+        results = []
+        with patch.object(CompletionIndex, "build", slow_build):
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    get_completion_index().built
+                )) for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        # the other requests did not wait for the index
+        self.assertEqual(results.count(None), 4)
+
+
+class CompleteViewTests(SimpleTestCase):
+    def setUp(self):
+        self.url = reverse("datadoc:complete")
+
+    @patch("datadoc.complete.get_completion_index", side_effect=make_index)
+    def test_complete_json(self, mock_index):
+        response = self.client.get(self.url, {"q": "image", "kind": "iri"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    @patch("datadoc.complete.get_completion_index", side_effect=make_index)
+    def test_complete_htmx_options(self, mock_index):
+        response = self.client.get(self.url, {"query": "sem"},
+                                   HTTP_HX_REQUEST="true")
+        self.assertContains(response, f'<option value="{EX}SEMImage">')
+
+    def test_complete_invalid_kind(self):
+        response = self.client.get(self.url, {"q": "a", "kind": "other"})
+        self.assertEqual(response.status_code, 400)
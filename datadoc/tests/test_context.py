@@ -0,0 +1,45 @@
+from django.apps import apps
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from datadoc.context import ContextProvider
+
+
+class ContextProviderTests(SimpleTestCase):
+    def setUp(self):
+        self.app = apps.get_app_config("datadoc")
+        self.calls = {"static": 0, "update": 0}
+
+        def static_context(ctx):
+            self.calls["static"] += 1
+            ctx["app_title"] = "datadocweb"
+            ctx["menu"] = ["explore"]
+
+        def update_context(request, ctx):
+            self.calls["update"] += 1
+            ctx["path"] = request.path
+            ctx["menu"].append(request.path)
+
+        self.app.static_context = static_context
+        self.app.update_context = update_context
+
+    def tearDown(self):
+        del self.app.static_context
+        del self.app.update_context
+
+    def test_static_context_is_built_once(self):
+        config = dict(settings.DATADOCWEB, apps=["datadoc"])
+        with override_settings(DATADOCWEB=config):
+            provider = ContextProvider()
+            request = RequestFactory().get("/explore/")
+            provider(request)
+            ctx = provider(request)
+        self.assertEqual(ctx["app_title"], "datadocweb")
+        self.assertEqual(ctx["path"], "/explore/")
+        # the static values are not modified by the previous requests
+        self.assertEqual(ctx["menu"], ["explore", "/explore/"])
+        self.assertEqual(ctx["datadoc_base_template"], "datadoc/base.html")
+        self.assertEqual(self.calls, {"static": 1, "update": 2})
+        stats = provider.stats()
+        self.assertEqual(stats[0]["name"], "datadoc")
+        self.assertEqual(stats[0]["calls"], 2)
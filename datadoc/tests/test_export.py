@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from tripper import DCTERMS, RDF, Literal, Triplestore
+
+from datadoc.admission import get_limiter
+from datadoc.export import batched, export
+
+
+TEMPLATE_JSON = settings.BASE_DIR / "core/static/core/templates/template.json"
+
+
+EX = "http://example.com/"
+
+
+def make_triplestore():
+    ts = Triplestore(backend="rdflib")
+    ts.bind("ex", EX)
+    ts.add_triples([
+        (f"{EX}a", RDF.type, f"{EX}Dataset"),
+        (f"{EX}a", DCTERMS.title, Literal("Dataset A", lang="en")),
+        (f"{EX}b", RDF.type, f"{EX}Dataset"),
+        (f"{EX}c", RDF.type, f"{EX}Sample"),
+    ])
+    return ts
+
+
+class ExportTests(SimpleTestCase):
+    def setUp(self):
+        self.ts = make_triplestore()
+
+    def test_export_turtle(self):
+        text = "".join(export(self.ts, "turtle", type=f"{EX}Dataset",
+                              page_size=1))
+        self.assertIn(f"@prefix ex: <{EX}> .", text)
+        self.assertIn(f'<{EX}a> <{DCTERMS.title}> "Dataset A"@en .', text)
+        self.assertIn(f"<{EX}b> <{RDF.type}> <{EX}Dataset> .", text)
+        self.assertNotIn(f"<{EX}c>", text)
+        target = Triplestore(backend="rdflib")
+        target.parse(data=text, format="turtle")
+        self.assertEqual(len(list(target.triples())), 3)
+
+    def test_export_jsonld(self):
+        text = "".join(export(self.ts, "jsonld", page_size=2))
+        data = json.loads(text)
+        nodes = {node["@id"]: node for node in data["@graph"]}
+        self.assertEqual(set(nodes), {f"{EX}a", f"{EX}b", f"{EX}c"})
+        self.assertEqual(nodes[f"{EX}c"]["@type"], [f"{EX}Sample"])
+        self.assertEqual(nodes[f"{EX}a"][DCTERMS.title],
+                         [{"@value": "Dataset A", "@language": "en"}])
+
+    def test_export_csv(self):
+        text = "".join(export(self.ts, "csv", type=f"{EX}Dataset",
+                              page_size=1))
+        rows = list(csv.reader(io.StringIO(text)))
+        self.assertEqual(rows[0][0], "@id")
+        self.assertEqual([row[0] for row in rows[1:]], [f"{EX}a", f"{EX}b"])
+        self.assertEqual(len(rows[1]), len(rows[0]))
+
+    def test_export_nested_blank_nodes(self):
+        from tripper.datadoc import store, told
+        source = Triplestore(backend="rdflib")
+        with open(TEMPLATE_JSON) as f:
+            store(source, told(json.load(f)))
+        for fmt in ("turtle", "jsonld"):
+            text = "".join(export(source, fmt))
+            target = Triplestore(backend="rdflib")
+            target.parse(data=text,
+                         format="json-ld" if fmt == "jsonld" else "turtle")
+            self.assertEqual(len(list(target.triples())),
+                             len(list(source.triples())))
+            self.assertEqual(
+                target.backend.graph.isomorphic(source.backend.graph), True
+            )
+        text = "".join(export(source, "csv"))
+        rows = list(csv.reader(io.StringIO(text)))
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row["dcterms:creator.foaf:name"], "Sigurd Wenner")
+        self.assertTrue(row["dcat:distribution.dcat:downloadURL"]
+                        .endswith(".tif"))
+
+    def test_batches_are_limited_by_length(self):
+        iris = [f"{EX}{'x' * 100}{i}" for i in range(100)]
+        batches = list(batched(iris, 500, 1000))
+        self.assertEqual(sum(len(batch) for batch in batches), 100)
+        self.assertGreater(len(batches), 1)
+        for batch in batches:
+            self.assertLessEqual(
+                sum(len(f"%3C{iri}%3E") for iri in batch), 1000 + len(batch)
+            )
+
+    def test_export_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            export(self.ts, "xml")
+
+    def test_export_prefixed_type(self):
+        text = "".join(export(self.ts, "turtle", type="ex:Sample"))
+        self.assertIn(f"<{EX}c>", text)
+        self.assertNotIn(f"<{EX}a>", text)
+
+
+class ExportViewTests(SimpleTestCase):
+    @patch("datadoc.views.get_triplestore")
+    def test_export_view_streams_turtle(self, mock_get_triplestore):
+        mock_get_triplestore.return_value = make_triplestore()
+        response = self.client.get(reverse("datadoc:export"),
+                                   {"format": "turtle"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/turtle")
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn(f"<{EX}c> <{RDF.type}> <{EX}Sample> .", content)
+
+    @patch("datadoc.views.get_triplestore")
+    def test_export_view_invalid_iri(self, mock_get_triplestore):
+        mock_get_triplestore.return_value = make_triplestore()
+        url = reverse("datadoc:export")
+        for params in ({"type": "x> . } } LIMIT 1 #"},
+                       {"graph": "_:b0"}, {"type": "<http://ex.org/a>"},
+                       {"type": "Dataset"}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("Invalid IRI", response.json()["message"])
+        self.assertEqual(get_limiter("read").active, 0)
+
+    @override_settings(DATADOCWEB=dict(
+        settings.DATADOCWEB, admission={"read": {"limit": 1, "queue": 0}}
+    ))
+    @patch("datadoc.views.get_triplestore")
+    def test_export_view_holds_a_read_slot(self, mock_get_triplestore):
+        mock_get_triplestore.return_value = make_triplestore()
+        url = reverse("datadoc:export")
+        response = self.client.get(url, {"format": "csv"})
+        self.assertEqual(get_limiter("read").active, 1)
+        self.assertEqual(self.client.get(url).status_code, 503)
+        b"".join(response.streaming_content)
+        response.close()
+        self.assertEqual(get_limiter("read").active, 0)
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,72 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from datadoc.models import RequestProfile
+from datadoc.profiling import Sampler
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.url = reverse("datadoc:upload_url")
+        self.staff = User.objects.create_user("admin", password="pass",
+                                              is_staff=True)
+
+    def test_profile_is_ignored_for_anonymous_users(self):
+        response = self.client.get(self.url, {"profile": "1"})
+        self.assertContains(response, 'id="url-form"')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_profile_report(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {"profile": "1"})
+        self.assertEqual(response["Content-Type"], "text/plain")
+        self.assertContains(response, "cumulative")
+        item = RequestProfile.objects.get()
+        self.assertEqual(item.kind, "manual")
+        self.assertEqual(item.user, "admin")
+
+    def test_profile_header(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, HTTP_X_DATADOC_PROFILE="1")
+        self.assertContains(response, 'id="url-form"')
+        item = RequestProfile.objects.get()
+        self.assertEqual(response["X-Datadoc-Profile-Id"], str(item.pk))
+
+    def test_slow_request_capture(self):
+        config = dict(settings.DATADOCWEB,
+                      profile={"slow_threshold": 0.0, "max_profiles": 2})
+        with override_settings(DATADOCWEB=config):
+            for _ in range(3):
+                self.client.get(self.url)
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        item = RequestProfile.objects.first()
+        self.assertEqual(item.kind, "slow")
+        self.assertIn("samples every 50 ms", item.profile)
+
+    def test_slow_request_capture_is_opt_in(self):
+        config = dict(settings.DATADOCWEB)
+        config.pop("profile", None)
+        with override_settings(DATADOCWEB=config):
+            self.client.get(self.url)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_sampler_waits_while_idle(self):
+        sampler = Sampler(0.001)
+        sampler.start(threading.get_ident())
+        self.assertTrue(sampler.active.is_set())
+        sampler.stop(threading.get_ident())
+        self.assertFalse(sampler.active.is_set())
+
+    def test_admin_list(self):
+        self.staff.is_superuser = True
+        self.staff.save()
+        self.client.force_login(self.staff)
+        self.client.get(self.url, {"profile": "1"})
+        response = self.client.get(
+            reverse("admin:datadoc_requestprofile_changelist")
+        )
+        self.assertContains(response, "/upload-url/?profile=1")
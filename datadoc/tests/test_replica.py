@@ -0,0 +1,131 @@
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from tripper import RDF, Triplestore
+
+from datadoc.cache import (
+    QueryCache, fragment_cache, get_query_cache, get_store_version
+)
+from datadoc.replica import (
+    SYNC_LOCK_KEY, Replica, get_read_triplestore, get_replica
+)
+from datadoc.triplestore import CachedTriplestore, VersionedTriplestore
+from datadoc.utils import get_triplestore
+
+
+EX = "http://example.com/"
+
+
+class ReplicaTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "replica.nt"
+        self.primary = Triplestore(backend="rdflib")
+        self.primary.add_triples([
+            (f"{EX}a{i}", RDF.type, f"{EX}Dataset") for i in range(5)
+        ])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_sync_and_snapshot(self):
+        replica = Replica(self.path, page_size=2)
+        self.assertFalse(replica.ready)
+        self.assertEqual(replica.sync(self.primary), 5)
+        self.assertTrue(replica.ready)
+        self.assertFalse(replica.is_due())
+        ts = replica.triplestore()
+        self.assertEqual(len(list(ts.subjects(RDF.type, f"{EX}Dataset"))), 5)
+        # a new process loads the snapshot
+        self.assertEqual(len(Replica(self.path).graph), 5)
+
+    def test_sync_invalidates_the_derived_results(self):
+        replica = Replica(self.path)
+        generation = get_query_cache().generation
+        version = get_store_version()
+        replica.sync(self.primary)
+        self.assertGreater(get_query_cache().generation, generation)
+        self.assertGreater(get_store_version(), version)
+        # the snapshot is written through a unique temporary file
+        self.assertEqual(sorted(p.name for p in self.path.parent.iterdir()),
+                         ["replica.nt"])
+
+    def test_invalid_snapshot(self):
+        self.path.write_text("<a> <b> .\n")
+        with self.assertLogs("datadoc.replica", "ERROR"):
+            replica = Replica(self.path)
+        self.assertFalse(replica.ready)
+        self.assertEqual(replica.sync(self.primary), 5)
+
+    def test_writes_are_replicated(self):
+        config = dict(settings.DATADOCWEB, replica={"path": self.path})
+        with override_settings(DATADOCWEB=config):
+            replica = get_replica()
+            replica.sync(self.primary)
+            ts = CachedTriplestore(backend="rdflib", cache=QueryCache())
+            ts.add_triples([(f"{EX}b", RDF.type, f"{EX}Sample")])
+            ts.remove(subject=f"{EX}b")
+            ts.add_triples([(f"{EX}c", RDF.type, f"{EX}Sample")])
+            read = get_read_triplestore()
+            self.assertEqual(list(read.subjects(RDF.type, f"{EX}Sample")),
+                             [f"{EX}c"])
+
+    def test_other_processes_see_the_writes(self):
+        primary = VersionedTriplestore(backend="rdflib")
+        primary.add_triples([(f"{EX}a", RDF.type, f"{EX}Dataset")])
+        # replicas of three processes sharing the cache and the snapshot
+        first = Replica(self.path)
+        first.sync(primary)
+        second = Replica(self.path)
+        third = Replica(self.path)
+        self.assertFalse(second.is_due())
+        primary.replica = first
+        primary.add_triples([(f"{EX}b", RDF.type, f"{EX}Dataset")])
+        # the write is applied to the replica of the first process only
+        self.assertFalse(first.is_due())
+        self.assertEqual(len(first.graph), 2)
+        self.assertTrue(second.is_due())
+        with patch("datadoc.replica.get_triplestore", return_value=primary):
+            second.refresh()
+        self.assertEqual(len(second.graph), 2)
+        self.assertFalse(second.is_due())
+        # the third process loads the snapshot of the second one
+        with patch("datadoc.replica.get_triplestore",
+                   side_effect=AssertionError("primary queried")):
+            self.assertTrue(third.is_due())
+            third.refresh()
+        self.assertEqual(len(third.graph), 2)
+        self.assertFalse(third.is_due())
+
+    def test_single_process_synchronises_the_primary(self):
+        replica = Replica(self.path)
+        replica.sync(self.primary)
+        replica.version = None
+        fragment_cache().add(SYNC_LOCK_KEY, 0, 60)
+        try:
+            with patch("datadoc.replica.get_triplestore",
+                       side_effect=AssertionError("primary queried")):
+                replica.refresh()
+        finally:
+            fragment_cache().delete(SYNC_LOCK_KEY)
+        self.assertGreater(replica.retry, 0)
+
+    def test_uncached_writes_are_replicated(self):
+        config = dict(settings.DATADOCWEB, cache=False,
+                      triplestore={"backend": "rdflib"},
+                      replica={"path": self.path})
+        with override_settings(DATADOCWEB=config):
+            replica = get_replica()
+            replica.sync(self.primary)
+            version = get_store_version()
+            ts = get_triplestore()
+            self.assertNotIsInstance(ts, CachedTriplestore)
+            ts.add_triples([(f"{EX}c", RDF.type, f"{EX}Sample")])
+            self.assertGreater(get_store_version(), version)
+            read = get_read_triplestore()
+            self.assertEqual(list(read.subjects(RDF.type, f"{EX}Sample")),
+                             [f"{EX}c"])
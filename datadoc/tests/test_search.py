@@ -0,0 +1,47 @@
+from django.test import SimpleTestCase
+
+from tripper import DCAT, RDF, Triplestore
+
+from datadoc.utils import make_search_query
+
+
+EX = "http://example.com/"
+
+
+class FacetedSearchQueryTests(SimpleTestCase):
+    def setUp(self):
+        self.ts = Triplestore(backend="rdflib")
+        self.ts.add_triples([
+            (f"{EX}a", RDF.type, DCAT.Dataset),
+            (f"{EX}a", RDF.type, f"{EX}SEMImage"),
+            (f"{EX}b", RDF.type, DCAT.Dataset),
+            (f"{EX}c", RDF.type, f"{EX}Sample"),
+        ])
+
+    def search(self, query="", types=()):
+        rows = self.ts.query(make_search_query(self.ts, query, types))
+        hits = sorted(f"{v}" for k, v, _ in rows if f"{k}" == "hit")
+        facets = {f"{v}": int(c) for k, v, c in rows if f"{k}" == "type"}
+        return hits, facets
+
+    def test_search_query(self):
+        hits, facets = self.search("Dataset")
+        self.assertEqual(hits, [f"{EX}a", f"{EX}b"])
+        self.assertEqual(facets, {DCAT.Dataset: 2, f"{EX}SEMImage": 1})
+
+    def test_search_query_and_types(self):
+        hits, facets = self.search("Dataset", (f"{EX}SEMImage",))
+        self.assertEqual(hits, [f"{EX}a"])
+        # the counts are not restricted by the selected types
+        self.assertEqual(facets, {DCAT.Dataset: 2, f"{EX}SEMImage": 1})
+
+    def test_search_any_of_types(self):
+        hits, facets = self.search(types=(f"{EX}SEMImage", f"{EX}Sample"))
+        self.assertEqual(hits, [f"{EX}a", f"{EX}c"])
+        self.assertEqual(facets[f"{EX}Sample"], 1)
+        self.assertEqual(facets[DCAT.Dataset], 2)
+
+    def test_invalid_type_iri(self):
+        for value in (EX + "a> } ?s ?p ?o { <" + EX, f"{EX}a b", ""):
+            with self.assertRaises(ValueError):
+                make_search_query(self.ts, "", (value,))
@@ -0,0 +1,34 @@
+from io import StringIO
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+
+SCRIPT = """
+import sys
+import django
+django.setup()
+import datadoc.urls
+from datadoc.utils import HEAVY_MODULES
+print(",".join(name for name in HEAVY_MODULES if name in sys.modules))
+"""
+
+
+class StartupTests(SimpleTestCase):
+    def test_heavy_modules_are_not_imported_at_startup(self):
+        out = subprocess.run(
+            [sys.executable, "-c", SCRIPT], cwd=settings.BASE_DIR,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE="core.settings"),
+            capture_output=True, text=True, check=True
+        )
+        self.assertEqual(out.stdout.strip(), "")
+
+    def test_preload_command(self):
+        out = StringIO()
+        call_command("preload", stdout=out)
+        self.assertIn("tripper.datadoc:", out.getvalue())
+        self.assertIn("total:", out.getvalue())
@@ -0,0 +1,114 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from tripper import RDF, Triplestore
+
+from datadoc.models import StoreCount
+from datadoc.statistics import get_statistics, namespace_key, recount
+from datadoc.utils import (
+    handle_file, handle_local_file, json_response, record_ingestion
+)
+
+
+EX = "http://example.com/data#"
+OTHER = "http://other.org/items/"
+TEMPLATES = Path(settings.BASE_DIR) / "core" / "static" / "core" / "templates"
+
+
+@record_ingestion(lambda name, triples, ts: name)
+def ingest(name, triples, ts):
+    ts.add_triples(triples)
+    if name == "broken.json":
+        return json_response("Exception", "failed")
+    return json_response("Success", "ok")
+
+
+def counts(kind):
+    return dict(StoreCount.objects.filter(kind=kind)
+                .values_list("key", "count"))
+
+
+class StoreStatisticsTests(TestCase):
+    def setUp(self):
+        self.ts = Triplestore(backend="rdflib")
+        self.ts.bind("ex", EX)
+
+    def test_namespace_key(self):
+        namespaces = {"ex": EX, "exd": "http://example.com/"}
+        self.assertEqual(namespace_key(f"{EX}a", namespaces), "ex")
+        self.assertEqual(namespace_key(f"{OTHER}b", namespaces), OTHER)
+
+    def test_incremental_counts(self):
+        ingest("a.json", [
+            (f"{EX}a", RDF.type, f"{EX}Dataset"),
+            (f"{EX}a", f"{EX}size", "3"),
+            (f"{OTHER}b", RDF.type, f"{EX}Dataset"),
+        ], self.ts)
+        ingest("c.yaml", [(f"{EX}c", RDF.type, f"{EX}Sample")], self.ts)
+        ingest("broken.json", [(f"{EX}d", RDF.type, f"{EX}Sample")],
+               self.ts)
+        self.assertEqual(counts("triples"), {"": 4})
+        self.assertEqual(counts("type"), {f"{EX}Dataset": 2,
+                                          f"{EX}Sample": 1})
+        self.assertEqual(counts("prefix"), {"ex": 3, OTHER: 1})
+        self.assertEqual(counts("upload"), {"a.json": 3, "c.yaml": 1})
+        self.assertEqual(counts("graph"), {"": 4})
+        # the methods of the triplestore are restored
+        self.assertNotIn("add_triples", vars(self.ts))
+        self.assertNotIn("parse", vars(self.ts))
+
+    def assert_ingested(self, name):
+        total = len(list(self.ts.triples()))
+        self.assertEqual(counts("triples"), {"": total})
+        self.assertEqual(counts("upload"), {name: total})
+        self.assertEqual(counts("graph"), {"": total})
+        type_counts = counts("type")
+        for _, _, o in self.ts.triples(predicate=RDF.type):
+            self.assertIn(f"{o}", type_counts)
+
+    def test_ingest_json_file(self):
+        data = (TEMPLATES / "template.json").read_bytes()
+        response = handle_file(SimpleUploadedFile("template.json", data),
+                               self.ts)
+        self.assertEqual(response.status_code, 200)
+        self.assert_ingested("template.json")
+        self.assertNotIn("parse", vars(self.ts))
+
+    def test_ingest_local_csv_file(self):
+        response = handle_local_file(str(TEMPLATES / "template.csv"),
+                                     "template.csv", self.ts)
+        self.assertEqual(response.status_code, 200)
+        self.assert_ingested("template.csv")
+
+    def test_recount(self):
+        ingest("a.json", [(f"{EX}a", RDF.type, f"{EX}Dataset")], self.ts)
+        # triples added without ingestion (drift)
+        self.ts.add_triples([(f"{EX}b", RDF.type, f"{EX}Dataset"),
+                             (f"{EX}b", f"{EX}size", "2")])
+        self.assertEqual(recount(self.ts), {"triples": 3, "drift": 2})
+        self.assertEqual(counts("triples"), {"": 3})
+        self.assertEqual(counts("type"), {f"{EX}Dataset": 2})
+        self.assertEqual(counts("prefix"), {"ex": 3})
+        self.assertEqual(counts("upload"), {"a.json": 1})
+        self.assertEqual(counts("graph"), {"": 3})
+        stats = get_statistics()
+        self.assertEqual(stats["triples"], 3)
+        self.assertEqual(stats["recount"].count, 2)
+
+    def test_dashboard(self):
+        url = reverse("datadoc:statistics")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        ingest("a.json", [(f"{EX}a", RDF.type, f"{EX}Dataset")], self.ts)
+        user = User.objects.create_user("admin", password="pass",
+                                        is_staff=True)
+        self.client.force_login(user)
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertContains(response, 'id="store-types"')
+        self.assertContains(response, f"<code>{EX}Dataset</code>")
+        self.assertContains(response, "<code>a.json</code>")
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+
+class CacheStatsViewTests(TestCase):
+    def setUp(self):
+        self.url = reverse("datadoc:cache_stats")
+
+    def test_cache_stats_requires_staff(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_cache_stats_renders_for_staff(self):
+        user = User.objects.create_user("admin", password="pass",
+                                        is_staff=True)
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'id="cache-stats"')
+        self.assertContains(response, 'id="cache-slowest"')
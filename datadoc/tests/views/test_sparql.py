@@ -0,0 +1,210 @@
+import csv
+import io
+import json
+import threading
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from tripper import RDF, Literal
+
+from datadoc.admission import get_limiter
+from datadoc.cache import QueryCache, bump_store_version
+from datadoc.sparql import (
+    SparqlError, get_executor, has_service, prepare_query, rdflib_query
+)
+from datadoc.triplestore import CachedTriplestore
+
+
+EX = "http://example.com/"
+SELECT = f"SELECT ?s ?label WHERE {{ ?s a <{EX}Dataset> . " \
+    f"OPTIONAL {{ ?s <{EX}label> ?label }} }} ORDER BY ?s"
+
+
+class PrepareQueryTests(SimpleTestCase):
+    def test_limit(self):
+        form, text = prepare_query(
+            "# datasets\nSELECT ?s WHERE {\n  ?s a <http://ex.org/a#B>\n}", 10
+        )
+        self.assertEqual(form, "SELECT")
+        self.assertEqual(text, "SELECT ?s WHERE { ?s a <http://ex.org/a#B> }"
+                               " LIMIT 11")
+        _, text = prepare_query("SELECT * WHERE { ?s ?p ?o } LIMIT 5 "
+                                "OFFSET 20", 10)
+        self.assertTrue(text.endswith("} LIMIT 5 OFFSET 20"))
+        _, text = prepare_query("CONSTRUCT WHERE { ?s ?p ?o } offset 3 "
+                                "limit 500", 10)
+        self.assertTrue(text.endswith("} LIMIT 11 OFFSET 3"))
+
+    def test_values_clause(self):
+        _, text = prepare_query(
+            "SELECT ?s WHERE { ?s ?p ?o } LIMIT 5 VALUES ?s { <a:b> <a:c> }",
+            10
+        )
+        self.assertEqual(text, "SELECT ?s WHERE { ?s ?p ?o } LIMIT 5 "
+                               "VALUES ?s { <a:b> <a:c> }")
+        # inline VALUES and VALUES in a literal
+        query = ('SELECT ?s WHERE { VALUES ?s { <a:b> } ?s ?p "} VALUES" }')
+        _, text = prepare_query(query, 10)
+        self.assertEqual(text, query + " LIMIT 11")
+
+    def test_read_only(self):
+        for query in ("INSERT DATA { <a:a> <a:b> <a:c> }",
+                      "ASK { ?s ?p ?o }",
+                      "PREFIX ex: <http://ex.org/> DELETE WHERE { ?s ?p ?o }"):
+            with self.assertRaises(SparqlError):
+                prepare_query(query, 10)
+
+
+    def test_has_service(self):
+        self.assertTrue(has_service(
+            "SELECT * WHERE { service silent <http://ex.org/sparql> "
+            "{ ?s ?p ?o } }"
+        ))
+        self.assertFalse(has_service(
+            f'SELECT ?SERVICE WHERE {{ ?s <{EX}SERVICE> "SERVICE" . '
+            f'?s ex:service ?SERVICE }}'
+        ))
+
+
+class SparqlViewTests(TestCase):
+    url = reverse("datadoc:sparql")
+
+    def setUp(self):
+        self.ts = CachedTriplestore(backend="rdflib", cache=QueryCache())
+        self.ts.add_triples([
+            (f"{EX}a", RDF.type, f"{EX}Dataset"),
+            (f"{EX}a", f"{EX}label", Literal("A", lang="en")),
+            (f"{EX}b", RDF.type, f"{EX}Dataset"),
+            (f"{EX}c", RDF.type, f"{EX}Dataset"),
+        ])
+        patcher = patch("datadoc.views.get_triplestore",
+                        return_value=self.ts)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache = patch("datadoc.sparql.get_query_cache",
+                      return_value=self.ts.cache)
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    def get(self, query, **params):
+        response = self.client.get(self.url, dict(params, query=query))
+        content = b"".join(response.streaming_content).decode()
+        return response, content
+
+    def test_select_json(self):
+        response, content = self.get(SELECT)
+        self.assertEqual(response["Content-Type"],
+                         "application/sparql-results+json")
+        data = json.loads(content)
+        self.assertEqual(data["head"]["vars"], ["s", "label"])
+        bindings = data["results"]["bindings"]
+        self.assertEqual(len(bindings), 3)
+        self.assertEqual(bindings[0]["label"],
+                         {"type": "literal", "value": "A", "xml:lang": "en"})
+        self.assertNotIn("label", bindings[1])
+
+    def test_select_csv(self):
+        response, content = self.get(SELECT, format="csv")
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], ["s", "label"])
+        self.assertEqual(rows[1], [f"{EX}a", "A"])
+        self.assertEqual(rows[2], [f"{EX}b", ""])
+
+    def test_construct(self):
+        response, content = self.get(
+            f"CONSTRUCT {{ ?s <{EX}name> ?l }} WHERE {{ ?s <{EX}label> ?l }}"
+        )
+        self.assertEqual(response["Content-Type"], "application/n-triples")
+        self.assertEqual(content, f'<{EX}a> <{EX}name> "A"@en .\n')
+
+    def test_cache_and_invalidation(self):
+        response, _ = self.get(SELECT)
+        self.assertEqual(response["X-Datadoc-Cache"], "miss")
+        response, _ = self.get(SELECT + "\n")
+        self.assertEqual(response["X-Datadoc-Cache"], "hit")
+        self.ts.add_triples([(f"{EX}d", RDF.type, f"{EX}Dataset")])
+        response, content = self.get(SELECT)
+        self.assertEqual(response["X-Datadoc-Cache"], "miss")
+        self.assertEqual(len(json.loads(content)["results"]["bindings"]), 4)
+
+    def test_values_clause_query(self):
+        response, content = self.get(
+            f"SELECT ?s WHERE {{ ?s a <{EX}Dataset> }} "
+            f"VALUES ?s {{ <{EX}b> <{EX}x> }}"
+        )
+        self.assertEqual(response.status_code, 200)
+        bindings = json.loads(content)["results"]["bindings"]
+        self.assertEqual(bindings, [{"s": {"type": "uri", "value": f"{EX}b"}}])
+
+    def test_writes_of_other_processes(self):
+        response, _ = self.get(SELECT)
+        self.assertEqual(response["X-Datadoc-Cache"], "miss")
+        # a write through another process increments the store version
+        bump_store_version()
+        response, _ = self.get(SELECT)
+        self.assertEqual(response["X-Datadoc-Cache"], "miss")
+
+    @override_settings(DATADOCWEB=dict(settings.DATADOCWEB,
+                                       sparql={"max_rows": 2}))
+    def test_max_rows(self):
+        with self.assertLogs("datadoc.sparql", "INFO") as logs:
+            response, content = self.get(SELECT)
+        self.assertEqual(response["X-Datadoc-Truncated"], "true")
+        self.assertEqual(len(json.loads(content)["results"]["bindings"]), 2)
+        self.assertIn("rows=2 truncated=True", logs.output[0])
+
+    def test_errors(self):
+        response = self.client.get(self.url,
+                                   {"query": "DELETE WHERE { ?s ?p ?o }"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {"query": "SELECT ?s WHERE {"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid query", response.json()["message"])
+        response = self.client.post(self.url, SELECT,
+                                    content_type="application/sparql-query")
+        self.assertEqual(response.status_code, 200)
+
+    def test_service_is_rejected(self):
+        response = self.client.get(self.url, {
+            "query": "SELECT * WHERE { SERVICE <http://ex.org/sparql> "
+                     "{ ?s ?p ?o } }"
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("SERVICE", response.json()["message"])
+
+    def test_shared_executor(self):
+        self.assertIs(get_executor(), get_executor())
+
+    @override_settings(DATADOCWEB=dict(
+        settings.DATADOCWEB, sparql={"timeout": 0.05},
+        admission={"read": {"limit": 1, "queue": 0}}
+    ))
+    def test_timeout_holds_the_read_slot(self):
+        started = threading.Event()
+        resume = threading.Event()
+
+        def slow_query(graph, text, form):
+            started.set()
+            resume.wait(5)
+            return rdflib_query(graph, text, form)
+
+        limiter = get_limiter("read")
+        with patch("datadoc.sparql.rdflib_query", slow_query):
+            response = self.client.get(self.url, {"query": SELECT})
+            self.assertEqual(response.status_code, 504)
+            self.assertTrue(started.is_set())
+            # the query still runs: no other query is admitted
+            self.assertEqual(limiter.stats()["active"], 1)
+            response = self.client.get(self.url, {"query": SELECT + " "})
+            self.assertEqual(response.status_code, 503)
+            self.assertIn("Retry-After", response)
+            resume.set()
+            for _ in range(500):
+                if limiter.stats()["active"] == 0:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(limiter.stats()["active"], 0)
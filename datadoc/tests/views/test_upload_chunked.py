@@ -0,0 +1,150 @@
+import hashlib
+import io
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from datadoc.chunked import ChunkedUpload, UploadError
+
+
+CONTENT = b'{"@id": "kb:image1", "@type": "sem:SEMImage"}' * 100
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config = dict(settings.DATADOCWEB, upload_dir=self.tmpdir.name)
+        self.override = override_settings(DATADOCWEB=config)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        self.tmpdir.cleanup()
+
+    def init_upload(self, **data):
+        data.setdefault("filename", "dataset.json")
+        response = self.client.post(reverse("datadoc:upload_chunked_init"),
+                                    data)
+        return response
+
+    def send_chunk(self, upload_id, chunk, offset, **headers):
+        return self.client.put(
+            reverse("datadoc:upload_chunked", args=[upload_id]), chunk,
+            content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset), **headers
+        )
+
+    def finalize(self, upload_id):
+        return self.client.post(
+            reverse("datadoc:upload_chunked_finalize", args=[upload_id])
+        )
+
+    @patch("datadoc.views.get_triplestore")
+    @patch("datadoc.views.handle_local_file")
+    def test_chunked_upload(self, mock_handle, mock_get_triplestore):
+        mock_get_triplestore.return_value = "mock_ts"
+        mock_handle.return_value = JsonResponse(
+            {"status": "Success", "message": "ok", "status_code": 200}
+        )
+        checksum = hashlib.sha256(CONTENT).hexdigest()
+        response = self.init_upload(size=len(CONTENT), checksum=checksum)
+        self.assertEqual(response.status_code, 200)
+        upload_id = response.json()["upload_id"]
+
+        response = self.send_chunk(upload_id, CONTENT[:1000], 0)
+        self.assertEqual(response.json()["offset"], 1000)
+
+        # resend the first chunk: the server returns the offset to resume
+        response = self.send_chunk(upload_id, CONTENT[:1000], 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 1000)
+
+        # finalize before the end of the upload
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+
+        chunk = CONTENT[1000:]
+        response = self.send_chunk(
+            upload_id, chunk, 1000,
+            HTTP_UPLOAD_CHECKSUM=hashlib.sha256(chunk).hexdigest()
+        )
+        self.assertEqual(response.json()["offset"], len(CONTENT))
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 200)
+        path, filename, ts = mock_handle.call_args[0]
+        self.assertEqual(filename, "dataset.json")
+        self.assertEqual(ts, "mock_ts")
+        response = self.client.get(
+            reverse("datadoc:upload_chunked", args=[upload_id])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_chunk_checksum_mismatch(self):
+        upload_id = self.init_upload().json()["upload_id"]
+        response = self.send_chunk(upload_id, CONTENT, 0,
+                                   HTTP_UPLOAD_CHECKSUM="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse("datadoc:upload_chunked", args=[upload_id])
+        )
+        self.assertEqual(response.json()["offset"], 0)
+
+    def test_file_checksum_mismatch(self):
+        response = self.init_upload(checksum="0" * 64)
+        upload_id = response.json()["upload_id"]
+        self.send_chunk(upload_id, CONTENT, 0)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "File checksum mismatch")
+
+    def test_unsupported_file_type(self):
+        response = self.init_upload(filename="dataset.exe")
+        self.assertEqual(response.status_code, 400)
+
+    def test_csrf_token_is_required(self):
+        client = Client(enforce_csrf_checks=True)
+        url = reverse("datadoc:upload_chunked_init")
+        response = client.post(url, {"filename": "dataset.json"})
+        self.assertEqual(response.status_code, 403)
+        client.get(reverse("datadoc:upload_url"))
+        token = client.cookies["csrftoken"].value
+        response = client.post(url, {"filename": "dataset.json"},
+                               HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+
+    def test_concurrent_chunks_at_the_same_offset(self):
+        upload_id = self.init_upload(size=len(CONTENT)).json()["upload_id"]
+        upload = ChunkedUpload(upload_id)
+        started = threading.Event()
+
+        class SlowStream(io.BytesIO):
+            def read(self, size=-1):
+                if not started.is_set():
+                    started.set()
+                    # the second chunk arrives during the first one
+                    time.sleep(0.05)
+                return super().read(size)
+
+        first = ChunkedUpload(upload_id)
+        results = []
+
+        def send():
+            results.append(first.append(SlowStream(CONTENT[:1000]), 0))
+
+        thread = threading.Thread(target=send)
+        thread.start()
+        started.wait()
+        try:
+            upload.append(io.BytesIO(CONTENT[:1000]), 0)
+            results.append("appended twice")
+        except UploadError as ex:
+            self.assertEqual(ex.status_code, 409)
+        thread.join()
+        self.assertEqual(results, [1000])
+        self.assertEqual(upload.offset, 1000)
@@ -0,0 +1,183 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from datadoc.admission import admission_control
+from datadoc.bulk import ManifestError, download, import_urls, parse_manifest
+
+
+def fake_download(url):
+    if "broken" in url:
+        raise ManifestError("Failed to fetch file. Status code: 404")
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    return path
+
+
+def fake_handle_local_file(path, name, ts):
+    assert os.path.exists(path)
+    return JsonResponse({"status": "Success", "message": "ok",
+                         "status_code": 200})
+
+
+class Tracker:
+    """ Count the concurrent calls (per key) of a slow function """
+
+    def __init__(self, func):
+        self.func = func
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+
+    def __call__(self, key, *args):
+        with self.lock:
+            self.active[key] = self.active.get(key, 0) + 1
+            self.peak[key] = max(self.peak.get(key, 0), self.active[key])
+        time.sleep(0.02)
+        with self.lock:
+            self.active[key] -= 1
+        return self.func(*args)
+
+
+class ParseManifestTests(SimpleTestCase):
+    def test_text_manifest(self):
+        text = "# datasets\nhttp://a.org/1.json\n\nhttp://a.org/2.yaml\n"
+        self.assertEqual(parse_manifest(text),
+                         ["http://a.org/1.json", "http://a.org/2.yaml"])
+
+    def test_json_manifest(self):
+        text = json.dumps({"urls": ["1.json", {"downloadURL": "2.csv"}]})
+        self.assertEqual(parse_manifest(text, "http://a.org/data/index.json"),
+                         ["http://a.org/data/1.json", "http://a.org/data/2.csv"])
+
+    def test_invalid_manifest(self):
+        with self.assertRaises(ManifestError):
+            parse_manifest(json.dumps({"files": []}))
+
+
+class DownloadTests(SimpleTestCase):
+    def response(self, status_code):
+        response = MagicMock(status_code=status_code)
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [b'{"a": ', b'1}']
+        return response
+
+    def test_download(self):
+        with patch("requests.get", return_value=self.response(200)):
+            path = download("http://a.org/data/1.json?raw=1")
+        self.addCleanup(os.unlink, path)
+        self.assertTrue(path.endswith(".json"))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b'{"a": 1}')
+
+    def test_download_error(self):
+        with patch("requests.get", return_value=self.response(404)):
+            with self.assertRaises(ManifestError):
+                download("http://a.org/1.json")
+
+
+@patch("datadoc.bulk.get_triplestore", return_value="mock_ts")
+@patch("datadoc.bulk.download", fake_download)
+@patch("datadoc.bulk.handle_local_file", fake_handle_local_file)
+class ImportUrlsTests(SimpleTestCase):
+    def test_outcome_per_url(self, mock_get_triplestore):
+        urls = ["http://a.org/1.json", "http://a.org/broken.json",
+                "http://a.org/readme.txt"]
+        summary = import_urls(urls, workers=2)
+        self.assertEqual((summary["total"], summary["succeeded"]), (3, 1))
+        results = summary["results"]
+        self.assertEqual([r["url"] for r in results], urls)
+        self.assertEqual([r["status"] for r in results],
+                         ["Success", "Error", "Error"])
+        self.assertIn("Status code: 404", results[1]["message"])
+        self.assertIn("Unsupported file type", results[2]["message"])
+
+    def test_per_host_limit(self, mock_get_triplestore):
+        tracker = Tracker(fake_download)
+        urls = [f"http://{host}/{i}.json" for host in ("a.org", "b.org")
+                for i in range(6)]
+        with patch("datadoc.bulk.download",
+                   lambda url: tracker(url.split("/")[2], url)):
+            summary = import_urls(urls, workers=8, per_host=2)
+        self.assertEqual(summary["succeeded"], 12)
+        self.assertEqual(tracker.peak, {"a.org": 2, "b.org": 2})
+
+    def test_write_budget(self, mock_get_triplestore):
+        downloads = Tracker(fake_download)
+        writes = Tracker(fake_handle_local_file)
+        urls = [f"http://h{i}.org/{i}.json" for i in range(8)]
+        config = dict(settings.DATADOCWEB,
+                      admission={"write": {"limit": 2, "queue": 8}})
+        with override_settings(DATADOCWEB=config), \
+                patch("datadoc.bulk.download",
+                      lambda url: downloads("all", url)), \
+                patch("datadoc.bulk.handle_local_file",
+                      lambda *args: writes("all", *args)):
+            summary = import_urls(urls, workers=8)
+        self.assertEqual(summary["succeeded"], 8)
+        # the downloads are not limited by the write budget
+        self.assertGreater(downloads.peak["all"], 2)
+        self.assertEqual(writes.peak["all"], 2)
+
+    def test_overloaded(self, mock_get_triplestore):
+        config = dict(settings.DATADOCWEB,
+                      admission={"write": {"limit": 1, "queue": 0}})
+        with override_settings(DATADOCWEB=config):
+            # the slot is taken by another upload
+            with admission_control("write"):
+                summary = import_urls(["http://a.org/1.json"])
+        result = summary["results"][0]
+        self.assertEqual(result["status_code"], 503)
+        self.assertIn("Server busy", result["message"])
+
+
+@patch("datadoc.bulk.get_triplestore", return_value="mock_ts")
+@patch("datadoc.bulk.download", fake_download)
+@patch("datadoc.bulk.handle_local_file", fake_handle_local_file)
+class UploadManifestViewTests(TestCase):
+    url = reverse("datadoc:upload_manifest")
+
+    def test_upload_url_list(self, mock_get_triplestore):
+        response = self.client.post(self.url, {
+            "urls": "http://a.org/1.json\nhttp://a.org/2.yaml"
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["succeeded"], 2)
+        self.assertTrue(data["message"].startswith("2 of 2 files imported"))
+
+    def test_partial_failure(self, mock_get_triplestore):
+        response = self.client.post(self.url, {
+            "urls": "http://a.org/1.json\nhttp://a.org/broken.json"
+        })
+        self.assertEqual(response.status_code, 207)
+        self.assertIn("http://a.org/broken.json: Failed to fetch file",
+                      response.json()["message"])
+
+    @override_settings(DATADOCWEB=dict(settings.DATADOCWEB,
+                                       bulk_import={"max_urls": 1}))
+    def test_too_many_urls(self, mock_get_triplestore):
+        response = self.client.post(self.url, {
+            "urls": "http://a.org/1.json\nhttp://a.org/2.json"
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Too many URLs", response.json()["message"])
+
+    @override_settings(DATADOCWEB=dict(
+        settings.DATADOCWEB, admission={"write": {"limit": 1, "queue": 0}}
+    ))
+    def test_server_busy(self, mock_get_triplestore):
+        with admission_control("write"):
+            response = self.client.post(self.url, {
+                "urls": "http://a.org/1.json"
+            })
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
@@ -0,0 +1,154 @@
+"""Triplestore subclasses used by datadoc
+
+This module imports tripper, it should be imported only when a triplestore
+is needed (see datadoc.utils.get_triplestore).
+"""
+
+import logging
+import time
+
+from tripper import Triplestore
+from tripper.triplestore import substitute_query
+
+from .cache import (
+    QueryCache, bump_store_version, get_query_cache, get_store_version,
+    normalize_query, READ_QUERY
+)
+from .replica import get_replica
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedTriplestore(Triplestore):
+    """ Triplestore which increments the store version (shared by the
+        processes, see datadoc.cache.get_store_version) on any update issued
+        through the instance, and applies the updates to the local replica
+        of the process (if configured). The replicas of the other processes
+        are synchronised again when they see the new version.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = get_replica()
+
+    def _replicate(self, name: str, *args):
+        if self.replica is not None:
+            try:
+                getattr(self.replica, name)(*args)
+            except Exception:
+                logger.exception('failed to update the replica')
+                self.replica.version = None
+
+    def _invalidate(self, replicated: bool = False):
+        version = bump_store_version()
+        if self.replica is not None and replicated:
+            self.replica.advance(version)
+
+    def update(self, query: str, iris=None, literals=None, **kwargs):
+        replicated = False
+        try:
+            result = super().update(query, iris=iris, literals=literals,
+                                    **kwargs)
+            self._replicate('update', substitute_query(
+                query, iris=iris, literals=literals, prefixes=self.namespaces
+            ))
+            replicated = True
+            return result
+        finally:
+            self._invalidate(replicated)
+
+    def add_triples(self, triples):
+        triples = list(triples)
+        replicated = False
+        try:
+            result = super().add_triples(triples)
+            self._replicate('add_triples', triples)
+            replicated = True
+            return result
+        finally:
+            self._invalidate(replicated)
+
+    def remove(self, subject=None, predicate=None, object=None, triple=None):
+        if triple:
+            subject, predicate, object = triple
+        elif subject and not isinstance(subject, str):
+            subject, predicate, object = subject
+        replicated = False
+        try:
+            result = super().remove(subject, predicate, object)
+            self._replicate('remove', subject, predicate, object)
+            replicated = True
+            return result
+        finally:
+            self._invalidate(replicated)
+
+    def parse(self, *args, **kwargs):
+        try:
+            return super().parse(*args, **kwargs)
+        finally:
+            # without a parse() method in the backend, the triples are
+            # added with add_triples() (and replicated), otherwise the
+            # replica is synchronised again (new version)
+            self._invalidate(not hasattr(self.backend, 'parse'))
+
+
+class CachedTriplestore(VersionedTriplestore):
+    """ Triplestore which memoises the read queries in a QueryCache and
+        invalidates it on any update issued through the same instance.
+    """
+
+    def __init__(self, *args, cache: QueryCache = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache if cache is not None else get_query_cache()
+        self.cache_store = f'{self.backend_name}:{self.base_iri or ""}'
+        if self.database:
+            self.cache_store += f':{self.database}'
+
+    def _invalidate(self, replicated: bool = False):
+        self.cache.invalidate(self.cache_store)
+        super()._invalidate(replicated)
+
+    def _cached(self, key: tuple, text: str, compute):
+        # the store version is shared by the processes: a write issued by
+        # any of them makes the entries of the others unreachable
+        key = key + (get_store_version(),)
+        found, value = self.cache.get(key)
+        if not found:
+            generation = self.cache.generation
+            start = time.perf_counter()
+            value = compute()
+            self.cache.put(key, value, time.perf_counter() - start, text,
+                           generation)
+        return value
+
+    def query(self, query: str, iris=None, literals=None, **kwargs):
+        text = normalize_query(substitute_query(
+            query, iris=iris, literals=literals, prefixes=self.namespaces
+        ))
+        # only SELECT and ASK results are plain python objects
+        if not READ_QUERY.match(text):
+            return super().query(query, iris=iris, literals=literals, **kwargs)
+        key = (self.cache_store, 'query', text, tuple(sorted(kwargs.items())))
+
+        def compute():
+            result = super(CachedTriplestore, self).query(
+                query, iris=iris, literals=literals, **kwargs
+            )
+            return list(result) if not isinstance(result, bool) else result
+
+        return self._cached(key, text, compute)
+
+    def triples(self, subject=None, predicate=None, object=None, triple=None):
+        if triple:
+            subject, predicate, object = triple
+        elif subject and not isinstance(subject, str):
+            subject, predicate, object = subject
+        key = (self.cache_store, 'triples', subject, predicate, object)
+        text = f'triples({subject}, {predicate}, {object})'
+
+        def compute():
+            return list(super(CachedTriplestore, self).triples(
+                subject=subject, predicate=predicate, object=object
+            ))
+
+        return iter(self._cached(key, text, compute))
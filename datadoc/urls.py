@@ -8,10 +8,19 @@ urlpatterns = [
     path("upload-url/", views.upload_url, name="upload_url"),
     path("upload-file/", views.upload_file, name="upload_file"),
     path("edit-form/", views.edit_form, name="edit_form"),
+    path("cache-stats/", views.cache_stats, name="cache_stats"),
+    path("statistics/", views.statistics, name="statistics"),
     # non template paths
     path("download/<str:filename>/", views.download_template, name="download_template"),
+    path("export/", views.export_resources, name="export"),
     path("upload/file/", views.upload_files, name="upload_files"),
+    path("upload/chunked/", views.upload_chunked_init, name="upload_chunked_init"),
+    path("upload/chunked/<str:upload_id>/", views.upload_chunked, name="upload_chunked"),
+    path("upload/chunked/<str:upload_id>/finalize/", views.upload_chunked_finalize, name="upload_chunked_finalize"),
     path("upload/url/", views.upload_file_url, name="upload_file_url"),
+    path("upload/manifest/", views.upload_manifest, name="upload_manifest"),
     path("process-csv/", views.process_csv, name="process_csv"),
     path('get-prefixes/', views.get_prefixes_view, name='get_prefixes'),
+    path("api/complete/", views.complete, name="complete"),
+    path("sparql/", views.sparql, name="sparql"),
 ]
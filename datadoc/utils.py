@@ -1,20 +1,38 @@
 """Util module for datadoc and Django"""
 
-from typing import Callable, Optional
+from __future__ import annotations
+
+from functools import wraps
+from typing import Callable, Optional, TYPE_CHECKING
+import hashlib
+import importlib
+import logging
 import os
 from pathlib import Path
 from urllib.parse import urlparse
 import tempfile
 import json
-import requests
+import re
+import time
 
 from django.conf import settings
 from django.http import JsonResponse
 from django.core.files.base import File
 
-from tripper import Triplestore, RDF
-from tripper.datadoc import (
-    save_datadoc, store, told, TableDoc, search_iris, load_dict
+if TYPE_CHECKING:  # pragma: no cover
+    from tripper import Triplestore
+
+logger = logging.getLogger(__name__)
+
+# tripper, rdflib and requests are slow to import, they are imported on first
+# use (or by preload) so that the Django startup and the simple pages do not
+# pay for them
+HEAVY_MODULES = (
+    "requests",
+    "tripper",
+    "tripper.datadoc",
+    "tripper.datadoc.dataset",
+    "datadoc.triplestore",
 )
 
 
@@ -24,6 +42,8 @@ SUPPORTED_EXTENSIONS = {
     "yaml": (".yaml", ".yml"),
 }
 STATUS_CODE = {"Success": 200, "Error": 400, "Exception": 500}
+# characters which are not allowed in an IRIREF of SPARQL
+INVALID_IRI = re.compile(r'[<>"{}|^`\\\x00-\x20]')
 
 
 def get_setting(name: str, default_value: str = ''):
@@ -31,11 +51,27 @@ def get_setting(name: str, default_value: str = ''):
     return settings.DATADOCWEB.get(name, default_value)
 
 
-def get_triplestore():
+def preload(modules=HEAVY_MODULES) -> dict:
+    """ Import the heavy modules and return their import time in seconds """
+    timing = {}
+    for name in modules:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timing[name] = time.perf_counter() - start
+    return timing
+
+
+def get_triplestore(cached: bool = True):
     """ Init a triple store using the datadocweb config """
     config = get_setting('triplestore', None)
     if config:
-        ts = Triplestore(**config)
+        if not cached or get_setting('cache', {}) is False:
+            # the writes are still tracked (store version and replica)
+            from .triplestore import VersionedTriplestore
+            ts = VersionedTriplestore(**config)
+        else:
+            from .triplestore import CachedTriplestore
+            ts = CachedTriplestore(**config)
         prefix = get_setting('prefix', None)
         if prefix:
             for key, val in prefix.items():
@@ -54,9 +90,11 @@ def get_filetype(filemame: str) -> str:
     return types.get(Path(filemame).suffix.lower(), "")
 
 
-def json_response(status: str, message: str = "", status_code: int = None):
+def json_response(
+    status: str, message: str = "", status_code: int = None, **extra
+):
     """Return a JsonResponse with status code selected based on status string
-    and included in the response body.
+    and included in the response body (with the extra items).
     """
     if isinstance(status_code, int):
         resolved_status_code = status_code
@@ -67,13 +105,38 @@ def json_response(status: str, message: str = "", status_code: int = None):
         "message": message,
         "status_code": resolved_status_code,
     }
+    content.update(extra)
     return JsonResponse(content, status=resolved_status_code)
 
 
+def record_ingestion(source: Callable):
+    """Decorator of the ingestion functions (whose last argument is the
+    triplestore) which updates the store statistics with the triples added
+    when the ingestion succeeds. source(*args) returns the name of the
+    upload.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            from .statistics import track_triples, update_statistics
+            ts = args[-1]
+            with track_triples(ts) as added:
+                response = func(*args)
+            if response.status_code == 200 and added:
+                try:
+                    update_statistics(ts, added, source(*args))
+                except Exception:
+                    logger.exception('failed to update the statistics')
+            return response
+        return wrapper
+    return decorator
+
+
 def write_csv(
     path: str, ts: Triplestore, headers: Optional[dict] = None
 ) -> JsonResponse:
     """Document data in CSV format"""
+    from tripper.datadoc import TableDoc
     try:
         td = TableDoc.parse_csv(path)
         td.save(ts)
@@ -86,6 +149,7 @@ def write_yaml(
     path: str, ts: Triplestore, headers: Optional[dict] = None
 ) -> JsonResponse:
     """Document data in YAML format"""
+    from tripper.datadoc import save_datadoc
     try:
         save_datadoc(ts, path)
         return json_response("Success", "File has populated the Graph")
@@ -97,6 +161,8 @@ def write_json(
     path: str, ts: Triplestore, headers: Optional[dict] = None
 ) -> JsonResponse:
     """Document data in JSON format"""
+    import requests
+    from tripper.datadoc import store, told
     try:
         response = requests.get(path, headers=headers)
         if response.status_code == 200:
@@ -118,6 +184,7 @@ def handle_spreadsheet(uploaded_file: File, ts: Triplestore) -> JsonResponse:
 
 def handle_json(uploaded_file: File, ts: Triplestore) -> JsonResponse:
     """Upload a JSON file"""
+    from tripper.datadoc import store, told
     status = ""
     try:
         dataset = told(json.load(uploaded_file))
@@ -136,6 +203,7 @@ def handle_yaml(uploaded_file: File, ts: Triplestore) -> JsonResponse:
     return process_with_temp_file(uploaded_file, "wb", write_yaml, ts)
 
 
+@record_ingestion(lambda uploaded_file, ts: uploaded_file.name)
 def handle_file(uploaded_file: File, ts: Triplestore) -> JsonResponse:
     """Update a file to the triplestore"""
     try:
@@ -153,6 +221,7 @@ def handle_file(uploaded_file: File, ts: Triplestore) -> JsonResponse:
         return json_response("Exception", str(ex))
 
 
+@record_ingestion(lambda url, ts: url)
 def handle_file_url(url: str, ts: Triplestore) -> JsonResponse:
     """Update a file from url to the triplestore"""
     try:
@@ -170,6 +239,27 @@ def handle_file_url(url: str, ts: Triplestore) -> JsonResponse:
         return json_response("Exception", str(ex))
 
 
+@record_ingestion(lambda path, filename, ts: filename)
+def handle_local_file(
+    path: str, filename: str, ts: Triplestore
+) -> JsonResponse:
+    """Update a file stored on the local disk to the triplestore"""
+    try:
+        filetype = get_filetype(filename)
+        if filetype == "spreadsheet":
+            return write_csv(path, ts)
+        elif filetype == "json":
+            with open(path, "rb") as f:
+                return handle_json(File(f, name=filename), ts)
+        elif filetype == "yaml":
+            return write_yaml(path, ts)
+        else:
+            ext = Path(filename).suffix
+            return json_response("Error", f'Unsupported file type "{ext}"')
+    except Exception as ex:
+        return json_response("Exception", str(ex))
+
+
 def save_uploaded_file_to_temp(uploaded_file: File, mode: str = "wb"):
     """Save file content to temp file"""
     file_extension = os.path.splitext(uploaded_file.name)[1]
@@ -198,6 +288,7 @@ def process_with_temp_file(
             os.remove(temp_file_path)
 
 
+@record_ingestion(lambda csv_data, ts: 'CSV form')
 def process_csv_form(csv_data: str, ts: Triplestore):
     temp_file_path = None
     try:
@@ -255,35 +346,101 @@ def value_to_cell(value) -> dict:
     return cell
 
 
-def value_to_option(value) -> dict:
-    """ Return option attributes for HTML tag OPTION """
-    opt = None
-    cell = value_to_cell(value)
-    if 'title' in cell['attrs_dict']:
-        opt = dict(value=cell['attrs_dict']['title'], text=cell['text'])
-    return opt
-
+def result_key(ts: Triplestore, query: str, types: tuple = ()) -> str:
+    """ Return a key identifying the result of a query in the current
+        version of the triplestore (used by the fragment cache).
+    """
+    from .cache import get_store_version
+    version = get_store_version()
+    text = f'{ts.base_iri}|{version}|{query}|{"|".join(sorted(types))}'
+    return hashlib.sha1(text.encode()).hexdigest()
 
-def triplestore_filters() -> dict:
-    """ Search all distinct RDF.type in the triplestore """
-    ts = get_triplestore()
 
-    options = []
-    types = set()
-    for item in ts.objects(predicate=RDF.type):
-        if item not in types:
-            types.add(item)
-            option = value_to_option(item)
-            if option:
-                options.append(option)
+def make_search_query(ts: Triplestore, query: str = '',
+                      types: tuple = ()) -> str:
+    """ Return a SPARQL query which selects the resources matching the
+        query (as in tripper.datadoc.search) and having one of the types,
+        and which counts the matching resources per RDF type (GROUP BY).
 
-    return options
+        The rows of the result are (kind, value, count) where kind is
+        "hit" for the IRI of a matching resource and "type" for the count
+        of a RDF type. A ValueError is raised for an invalid type IRI.
+    """
+    from tripper import RDF
+
+    if query:
+        from tripper.datadoc.dataset import make_query
+        base = make_query(ts, type=query, query_type='SELECT DISTINCT')
+        # the prefix rdf is declared in the outer query
+        base = re.sub(r'^\s*PREFIX[^\n]*\n', '', base, count=1)
+        base = f'{{ {base.strip()} }}'
+    else:
+        base = '?iri rdf:type ?any .'
+    selected = ''
+    if types:
+        for t in types:
+            if not t or INVALID_IRI.search(t):
+                raise ValueError(f'Invalid type IRI: {t!r}')
+        values = ' '.join(f'<{t}>' for t in types)
+        selected = (
+            f'VALUES ?selected {{ {values} }} ?iri rdf:type ?selected .'
+        )
+
+    return f"""
+    PREFIX rdf: <{RDF}>
+    SELECT ?kind ?value ?count WHERE {{
+      {{
+        {{
+          SELECT DISTINCT ?value WHERE {{
+            {base}
+            {selected}
+            FILTER(!isBlank(?iri))
+            BIND(?iri AS ?value)
+          }}
+        }}
+        BIND("hit" AS ?kind)
+        BIND(0 AS ?count)
+      }} UNION {{
+        {{
+          SELECT ?value (COUNT(DISTINCT ?iri) AS ?count) WHERE {{
+            {base}
+            ?iri rdf:type ?value .
+            FILTER(!isBlank(?iri) && isIRI(?value))
+          }} GROUP BY ?value
+        }}
+        BIND("type" AS ?kind)
+      }}
+    }}
+    """
 
 
-def triplestore_search(query: str) -> dict:
-    """ Search in the triplestore """
-    ts = get_triplestore()
-    iris = search_iris(ts, query)
+def triplestore_search(query: str, types: tuple = (),
+                       ts: Triplestore = None) -> dict:
+    """ Search in the triplestore (default: the read triplestore), the
+        resources are filtered by the query and by the types (any of), the
+        facets are the number of resources matching the query for each RDF
+        type.
+    """
+    from tripper.datadoc import TableDoc, load_dict
+    if ts is None:
+        from .replica import get_read_triplestore
+        ts = get_read_triplestore()
+    types = tuple(ts.expand_iri(t) for t in types)
+
+    iris = []
+    facets = []
+    for kind, value, count in ts.query(make_search_query(ts, query, types)):
+        if f'{kind}' == 'hit':
+            iris.append(f'{value}')
+        else:
+            text = value_to_cell(f'{value}')['text'] or f'{value}'
+            facets.append({
+                'value': f'{value}',
+                'text': text,
+                'count': int(count),
+                'selected': f'{value}' in types,
+            })
+    facets.sort(key=lambda x: (-x['count'], x['text']))
 
     dicts = [load_dict(ts, iri) for iri in iris]
     td = TableDoc.fromdicts(dicts)
@@ -294,8 +451,10 @@ def triplestore_search(query: str) -> dict:
         rows.append(newrow)
 
     result = {
+        'key': result_key(ts, query, types),
         'cols': td.header,
         'rows': rows,
+        'facets': facets,
         'prefix': {k: f'{v}' for k, v in ts.namespaces.items()}
     }
 
@@ -3,36 +3,38 @@
 from pathlib import Path
 import mimetypes
 
-from django.apps import apps
 from django.shortcuts import render
-from django.http import FileResponse, Http404, JsonResponse
+from django.http import (
+    FileResponse, Http404, JsonResponse, StreamingHttpResponse
+)
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.contrib.admin.views.decorators import staff_member_required
 
-from tripper.datadoc.dataset import get_prefixes
+from .admission import (
+    AdmittedIterator, Overloaded, admission_control, admission_stats, admit,
+    retry_after
+)
+from .cache import fragment_cache, get_query_cache
+from .context import context_provider
 from .utils import (
     json_response,
     get_triplestore,
     handle_file,
     handle_file_url,
+    handle_local_file,
     process_csv_form,
     get_setting,
-    triplestore_search,
-    triplestore_filters
+    result_key,
+    triplestore_search
 )
 
 
 def default_context(request):
     """ Create a default context from the settings and from multiple
-        AppConfig.
+        AppConfig (see datadoc.context).
     """
-    ctx = {}
-    base = get_setting('base_template', 'datadoc/base.html')
-    ctx['datadoc_base_template'] = base
-    app_names = get_setting('apps', [])
-    for app in apps.get_app_configs():
-        if app.name in app_names:
-            app.update_context(request, ctx)
-    return ctx
+    return context_provider(request)
 
 
 def index(request):
@@ -60,6 +62,7 @@ def get_prefixes_view(request):
     """
     Django view to return the list of prefixes from Tripper as JSON.
     """
+    from tripper.datadoc.dataset import get_prefixes
     prefixes_dict = get_prefixes()
     prefixes = [{'prefix': k, 'iri': v} for k, v in prefixes_dict.items()]
     return JsonResponse({'prefixes': prefixes})
@@ -75,23 +78,168 @@ def upload_url(request):
     return render(request, "datadoc/views/upload_url.html", ctx)
 
 
+def explore_table(query: str, types: list) -> dict:
+    """Return the explore results (header, rendered rows and facets) from
+    the fragment cache, the key is computed before searching so that a hit
+    does not query the triplestore.
+    """
+    from .replica import get_read_triplestore
+    from .templatetags.datadoc_tags import result_rows
+
+    ts = get_read_triplestore()
+    types = tuple(ts.expand_iri(t) for t in types)
+    cache = fragment_cache()
+    key = f'datadoc:explore:{result_key(ts, query, types)}'
+    table = cache.get(key, None)
+    if table is None:
+        with admission_control('read'):
+            result = triplestore_search(query, types, ts)
+        table = {
+            'cols': result['cols'],
+            'html': result_rows(result['rows']) if result['rows'] else '',
+            'facets': result['facets'],
+        }
+        cache.set(key, table, get_setting('fragment_timeout', 300))
+    return table
+
+
+@gzip_page
 def explore(request):
     ctx = default_context(request)
     query = request.GET.get('query', '')
-    if query:
+    types = request.GET.getlist('type')
+    status = 200
+    if query or types:
         ctx['query'] = query
+        ctx['types'] = types
         ctx['error'] = ''
         try:
-            # TODO: refine the "filters" feature, what filters to add?
-            ctx['filters'] = triplestore_filters()
-            ctx['table'] = triplestore_search(query)
+            ctx['table'] = explore_table(query, types)
+            ctx['filters'] = ctx['table'].get('facets', [])
+        except Overloaded as ex:
+            status = 503
+            ctx['error'] = f'Server busy: "{ex}", please retry later.'
         except Exception as ex:
             doc = ex.__class__.__doc__.rstrip('.')
             if not doc:
                 doc = ex.__class__.__name__
             err = str(ex).strip("'")
             ctx['error'] = f'{doc}: "{err}".'
-    return render(request, "datadoc/views/explore.html", ctx)
+    response = render(request, "datadoc/views/explore.html", ctx,
+                      status=status)
+    if status == 503:
+        response['Retry-After'] = retry_after()
+    return response
+
+
+@staff_member_required
+def cache_stats(request):
+    """Show the statistics of the triplestore query cache"""
+    cache = get_query_cache()
+    if request.method == "POST":
+        if "clear" in request.POST:
+            cache.invalidate()
+        if "reset" in request.POST:
+            cache.reset_stats()
+    ctx = default_context(request)
+    ctx['stats'] = cache.stats()
+    ctx['context_stats'] = context_provider.stats()
+    ctx['admission_stats'] = admission_stats()
+    return render(request, "datadoc/views/cache_stats.html", ctx)
+
+
+@staff_member_required
+def statistics(request):
+    """Show the statistics of the content of the triplestore"""
+    from .statistics import get_statistics
+
+    ctx = default_context(request)
+    ctx['stats'] = get_statistics()
+    return render(request, "datadoc/views/statistics.html", ctx)
+
+
+def complete(request):
+    """Return the completion items (IRIs, labels, types and prefixes) which
+    start with the text "q" (typeahead)
+    """
+    from .complete import COMPLETION_KINDS, get_completion_index
+
+    text = request.GET.get("q", request.GET.get("query", "")).strip()
+    kind = request.GET.get("kind", None)
+    if kind and kind not in COMPLETION_KINDS:
+        return json_response("Error", f'Unsupported kind "{kind}"')
+    try:
+        limit = min(int(request.GET.get("limit", 10)), 50)
+    except ValueError:
+        return json_response("Error", "limit must be an integer")
+    results = []
+    if text:
+        try:
+            index = get_completion_index()
+        except Exception as ex:
+            return json_response("Exception", str(ex))
+        results = index.complete(text, kind, limit)
+    if request.headers.get("HX-Request"):
+        return render(request, "datadoc/partials/complete.html",
+                      {"results": results})
+    return JsonResponse({"results": results})
+
+
+@csrf_exempt
+def sparql(request):
+    """Read-only SPARQL endpoint (SELECT and CONSTRUCT queries) with the
+    results in SPARQL JSON, CSV or N-Triples (CONSTRUCT), the queries which
+    are not cached run within the "read" budget.
+    """
+    from .sparql import (
+        RESULT_FORMATS, RESULT_WRITERS, SparqlError, sparql_query
+    )
+
+    if request.method == "GET":
+        query = request.GET.get("query", "")
+    elif request.method == "POST":
+        if request.content_type == "application/sparql-query":
+            query = request.body.decode(request.encoding or "utf-8")
+        else:
+            query = request.POST.get("query", "")
+    else:
+        return json_response("Error", "Method not allowed", 405)
+    if not query.strip():
+        return json_response("Error", "No query")
+
+    fmt = request.GET.get("format", "")
+    accept = request.headers.get("Accept", "")
+    if not fmt:
+        if "text/csv" in accept:
+            fmt = "csv"
+        elif "application/n-triples" in accept:
+            fmt = "nt"
+    if fmt and fmt not in RESULT_FORMATS:
+        return json_response("Error", f'Unsupported result format "{fmt}"')
+
+    user = request.user.get_username() if request.user.is_authenticated \
+        else ""
+    try:
+        result = sparql_query(get_triplestore(), query, user)
+    except SparqlError as ex:
+        return json_response("Error", str(ex), ex.status_code)
+    except Overloaded as ex:
+        response = json_response("Error", f'Server busy: {ex}', 503)
+        response['Retry-After'] = retry_after()
+        return response
+    except Exception as ex:
+        return json_response("Exception", str(ex))
+
+    if not fmt:
+        fmt = "nt" if result["form"] == "CONSTRUCT" else "json"
+    if fmt == "nt" and result["form"] != "CONSTRUCT":
+        return json_response("Error", "N-Triples is only for CONSTRUCT")
+    response = StreamingHttpResponse(RESULT_WRITERS[fmt](result),
+                                     content_type=RESULT_FORMATS[fmt])
+    response["X-Datadoc-Cache"] = "hit" if result["cached"] else "miss"
+    if result["truncated"]:
+        response["X-Datadoc-Truncated"] = "true"
+    return response
 
 
 def download_template(request, filename):
@@ -110,6 +258,38 @@ def download_template(request, filename):
     raise Http404("Template not found")
 
 
+def export_resources(request):
+    """Export (stream) the selected resources in CSV, JSON-LD or Turtle"""
+    from .export import EXPORT_FORMATS, export
+
+    fmt = request.GET.get("format", "turtle")
+    if fmt not in EXPORT_FORMATS:
+        return json_response("Error", f'Unsupported export format "{fmt}"')
+    ts = get_triplestore(cached=False)
+    try:
+        chunks = export(
+            ts, fmt,
+            query=request.GET.get("query", ""),
+            type=request.GET.get("type", None),
+            graph=request.GET.get("graph", None),
+            page_size=get_setting("export_page_size", 500),
+        )
+    except ValueError as ex:
+        return json_response("Error", str(ex))
+    try:
+        # the read slot is held while the response is streamed
+        chunks = AdmittedIterator('read', chunks)
+    except Overloaded as ex:
+        response = json_response("Error", f'Server busy: {ex}', 503)
+        response['Retry-After'] = retry_after()
+        return response
+    content_type, ext = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="export{ext}"'
+    return response
+
+
+@admit('write')
 def upload_files(request):
     """Upload files to the triple store"""
 
@@ -120,6 +300,80 @@ def upload_files(request):
     return handle_file(request.FILES["files"], ts)
 
 
+def upload_error(ex):
+    """Return the JSON response of a chunked upload error"""
+    return json_response("Error", str(ex), ex.status_code, **ex.extra)
+
+
+def upload_chunked_init(request):
+    """Create a resumable chunked upload of a file"""
+    from .chunked import ChunkedUpload, UploadError
+
+    if request.method != "POST":
+        return json_response("Error", "Method not allowed", 405)
+    try:
+        size = request.POST.get("size", None)
+        size = int(size) if size else None
+    except ValueError:
+        return json_response("Error", "size must be an integer")
+    try:
+        upload = ChunkedUpload.create(
+            request.POST.get("filename", ""), size,
+            request.POST.get("checksum", None)
+        )
+    except UploadError as ex:
+        return upload_error(ex)
+    return json_response("Success", "Upload created", upload_id=upload.id,
+                         offset=0)
+
+
+def upload_chunked(request, upload_id):
+    """Return the offset of a chunked upload (GET), append a chunk sent in
+    the request body at the offset given by the header "Upload-Offset"
+    (PUT or POST) or cancel the upload (DELETE)
+    """
+    from .chunked import ChunkedUpload, UploadError
+
+    try:
+        upload = ChunkedUpload(upload_id)
+        if request.method == "GET":
+            return json_response("Success", "", offset=upload.offset)
+        elif request.method in ("PUT", "POST"):
+            try:
+                offset = int(request.headers.get("Upload-Offset", ""))
+            except ValueError:
+                return json_response("Error", "Invalid Upload-Offset header")
+            checksum = request.headers.get("Upload-Checksum", None)
+            offset = upload.append(request, offset, checksum)
+            return json_response("Success", "Chunk received", offset=offset)
+        elif request.method == "DELETE":
+            upload.delete()
+            return json_response("Success", "Upload cancelled")
+        return json_response("Error", "Method not allowed", 405)
+    except UploadError as ex:
+        return upload_error(ex)
+
+
+@admit('write')
+def upload_chunked_finalize(request, upload_id):
+    """Verify a chunked upload and update the file to the triple store"""
+    from .chunked import ChunkedUpload, UploadError
+
+    if request.method != "POST":
+        return json_response("Error", "Method not allowed", 405)
+    try:
+        upload = ChunkedUpload(upload_id)
+        path = upload.assemble()
+    except UploadError as ex:
+        return upload_error(ex)
+    ts = get_triplestore()
+    response = handle_local_file(str(path), upload.meta["filename"], ts)
+    if response.status_code == 200:
+        upload.delete()
+    return response
+
+
+@admit('write')
 def upload_file_url(request):
     """Upload documentation to the triple store from file URL's"""
     if request.method == "POST":
@@ -128,7 +382,54 @@ def upload_file_url(request):
         return handle_file_url(url, ts)
 
 
+def upload_manifest(request):
+    """Upload documentation to the triple store from a list of file URL's
+    (form field "urls", one URL per line) or from the URL of a manifest
+    (form field "manifest"), the files are imported concurrently (each one
+    within the "write" budget).
+    """
+    from .bulk import ManifestError, fetch_manifest, import_urls, \
+        parse_manifest
+
+    if request.method != "POST":
+        return json_response("Error", "Method not allowed", 405)
+    try:
+        manifest = request.POST.get("manifest", "").strip()
+        if manifest:
+            urls = fetch_manifest(manifest)
+        else:
+            urls = parse_manifest(request.POST.get("urls", ""))
+        if not urls:
+            return json_response("Error", "No URL to import")
+        summary = import_urls(urls)
+    except ManifestError as ex:
+        return json_response("Error", str(ex))
+    except Exception as ex:
+        return json_response("Exception", str(ex))
+
+    lines = [
+        f'{summary["succeeded"]} of {summary["total"]} files imported '
+        f'in {summary["duration"]:.1f} s'
+    ]
+    for result in summary["results"]:
+        if result["status"] != "Success":
+            lines.append(f'{result["url"]}: {result["message"]}')
+    if summary["failed"] == 0:
+        status, status_code = "Success", 200
+    else:
+        status = "Error"
+        status_code = 207 if summary["succeeded"] else 400
+        if all(r["status_code"] == 503 for r in summary["results"]):
+            status_code = 503
+    response = json_response(status, "\n".join(lines), status_code,
+                             **summary)
+    if status_code == 503:
+        response['Retry-After'] = retry_after()
+    return response
+
+
 @csrf_exempt
+@admit('write')
 def process_csv(request):
     if request.method == "POST":
 